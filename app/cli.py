@@ -0,0 +1,160 @@
+from app.config.config import settings
+from app.db import database
+from app.db.database import init_db
+from app.schemas.job_schema import IngestionJobCreate
+from app.services.elastic_search import ElasticSearchService
+from app.services.search import search_service
+from app.services.pipeline import with_embeddings
+from app.services.compaction import run_compaction
+from app.services.ingestion import ingest_pdf_batch
+from app.services.job import claim_batch_jobs, create_job, get_batch_jobs, requeue_batch_jobs, summarize_batch
+from app.services.pdf_extractor import shutdown_extraction_executor
+from app.services.ocr import shutdown_ocr_executor
+from app.services.user import get_user
+from app.utils.upload import spool_file
+from typing import BinaryIO, Callable, Dict, Iterator, Tuple
+import argparse
+import os
+import time
+import uuid
+import zipfile
+
+def reindex(target: str, swap_alias: bool):
+    # Copies every block into a new index built from the current ES_* index profile,
+    # re-embedding the blocks whose vectors are not stored in _source
+    if not isinstance(search_service, ElasticSearchService):
+        print("Reindexing is only available with SEARCH_BACKEND=elasticsearch.")
+        return
+
+    source = settings.INDEX_NAME
+    start = time.perf_counter()
+
+    search_service.create_index(target)
+    result = search_service.index_document(
+        with_embeddings(search_service.iter_pdf_blocks(index_name=source)),
+        refresh_interval="-1",
+        index_name=target
+    )
+    search_service.es.indices.refresh(index=target)
+
+    print(f"Reindexed {result.indexed} blocks from {source} into {target} in {time.perf_counter() - start:.1f}s, {len(result.errors)} failed.")
+
+    if result.errors:
+        return
+
+    if search_service.es.indices.exists_alias(name=source):
+        if swap_alias:
+            current = list(search_service.es.indices.get_alias(name=source).keys())
+            search_service.es.indices.update_aliases(actions=[
+                *({"remove": {"index": index, "alias": source}} for index in current),
+                {"add": {"index": target, "alias": source}},
+            ])
+            print(f"Alias {source} now points to {target}.")
+    else:
+        print(f"Set INDEX_NAME={target} to serve from the new index.")
+
+def iter_source_files(path: str) -> Iterator[Tuple[str, Callable[[], BinaryIO]]]:
+    if zipfile.is_zipfile(path):
+        archive = zipfile.ZipFile(path)
+        for member in sorted(archive.namelist()):
+            if member.lower().endswith(".pdf"):
+                yield member, lambda member=member: archive.open(member)
+        return
+
+    for root, _, file_names in sorted(os.walk(path)):
+        for file_name in sorted(file_names):
+            if file_name.lower().endswith(".pdf"):
+                file_path = os.path.join(root, file_name)
+                yield os.path.relpath(file_path, path), lambda file_path=file_path: open(file_path, "rb")
+
+def create_batch_jobs(path: str, user_id: uuid.UUID, batch_id: uuid.UUID, db) -> Dict[str, str]:
+    rejected: Dict[str, str] = {}
+
+    for file_name, open_source in iter_source_files(path):
+        job_id = uuid.uuid4()
+        try:
+            with open_source() as source:
+                file_path, content_hash = spool_file(job_id, source)
+        except ValueError as e:
+            rejected[file_name] = str(e)
+            continue
+
+        create_job(IngestionJobCreate(
+            id=job_id,
+            user_id=user_id,
+            pdf_id=uuid.uuid4(),
+            batch_id=batch_id,
+            file_name=file_name,
+            file_path=file_path,
+            content_hash=content_hash,
+        ), db)
+
+    return rejected
+
+def ingest(path: str, email: str, resume: str):
+    # Every file is a job of the batch, so a batch cut short by a crash is picked up again with --resume
+    db = database.SessionLocal()
+    rejected: Dict[str, str] = {}
+    start = time.perf_counter()
+
+    try:
+        if resume:
+            batch_id = uuid.UUID(resume)
+            requeue_batch_jobs(batch_id, db)
+        else:
+            user = get_user(email, db)
+            if user is None:
+                print(f"User {email} not found.")
+                return
+
+            batch_id = uuid.uuid4()
+            print(f"Creating batch {batch_id}, resume it with: python -m app.cli ingest --resume {batch_id}")
+            rejected = create_batch_jobs(path, user.id, batch_id, db)
+
+        while jobs := claim_batch_jobs(batch_id, db, settings.BATCH_FILES_PER_RUN):
+            ingest_pdf_batch(jobs, db)
+            batch = summarize_batch(batch_id, get_batch_jobs(batch_id, db))
+            print(f"{dict(batch.status_counts)} of {batch.total} files after {time.perf_counter() - start:.1f}s")
+
+        batch = summarize_batch(batch_id, get_batch_jobs(batch_id, db), rejected)
+        for job in batch.jobs:
+            print(f"{job.status:<10} {job.file_name}" + (f" ({job.error})" if job.error else ""))
+        for file_name, reason in batch.rejected.items():
+            print(f"{'rejected':<10} {file_name} ({reason})")
+
+    finally:
+        db.close()
+        shutdown_extraction_executor()
+        shutdown_ocr_executor()
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    reindex_parser = commands.add_parser("reindex", help="Copy the index into a new one using the configured index profile")
+    reindex_parser.add_argument("target", help="Name of the new index")
+    reindex_parser.add_argument("--swap-alias", action="store_true", help="Point the INDEX_NAME alias at the new index when done")
+
+    compact_parser = commands.add_parser("compact", help="Report and delete orphaned blocks, backfill block owners")
+    compact_parser.add_argument("--dry-run", action="store_true")
+
+    ingest_parser = commands.add_parser("ingest", help="Ingest every PDF in a directory or zip archive as one batch")
+    ingest_parser.add_argument("path", nargs="?", help="Directory or zip archive of PDFs")
+    ingest_parser.add_argument("--email", help="Owner of the ingested PDFs")
+    ingest_parser.add_argument("--resume", metavar="BATCH_ID", help="Resume an interrupted batch instead of starting a new one")
+
+    args = parser.parse_args()
+
+    if args.command == "reindex":
+        reindex(args.target, args.swap_alias)
+    elif args.command == "ingest":
+        if not args.resume and not (args.path and args.email):
+            parser.error("ingest needs a path and --email, or --resume")
+        init_db()
+        ingest(args.path, args.email, args.resume)
+    elif args.command == "compact":
+        init_db()
+        print(run_compaction(dry_run=args.dry_run).model_dump_json(indent=2))
+
+if __name__ == "__main__":
+    main()
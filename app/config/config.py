@@ -5,10 +5,100 @@ load_dotenv()
 
 class Settings:
     DATABASE_URL: str = os.getenv("DATABASE_URL", "")
+    DATABASE_ASYNC_URL: str = os.getenv("DATABASE_ASYNC_URL", "")
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", 10))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", 10))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", 10))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", 1800))
     JWT_SECRET: str = os.getenv("JWT_SECRET", "")
     EXPIRY_TIME: int = int(os.getenv("EXPIRY_TIME", 60))
+    SEARCH_BACKEND: str = os.getenv("SEARCH_BACKEND", "elasticsearch")
+    LOCAL_SEARCH_DIR: str = os.getenv("LOCAL_SEARCH_DIR", "search_data")
+    LOCAL_SEARCH_FLUSH_SIZE: int = int(os.getenv("LOCAL_SEARCH_FLUSH_SIZE", 10000))
+    LOCAL_SEARCH_IVF: bool = os.getenv("LOCAL_SEARCH_IVF", "false").lower() == "true"
+    LOCAL_SEARCH_IVF_MIN_VECTORS: int = int(os.getenv("LOCAL_SEARCH_IVF_MIN_VECTORS", 50000))
+    LOCAL_SEARCH_IVF_NPROBE: int = int(os.getenv("LOCAL_SEARCH_IVF_NPROBE", 8))
     ES_HOST: str = os.getenv("ES_HOST", "http://localhost:9200")
     ES_API_KEY: str = os.getenv("ES_API_KEY")
     INDEX_NAME: str = os.getenv("INDEX_NAME")
+    ES_REQUEST_TIMEOUT: float = float(os.getenv("ES_REQUEST_TIMEOUT", 10))
+    ES_MAX_RETRIES: int = int(os.getenv("ES_MAX_RETRIES", 3))
+    ES_RETRY_BACKOFF: float = float(os.getenv("ES_RETRY_BACKOFF", 0.5))
+    ES_RETRY_BACKOFF_MAX: float = float(os.getenv("ES_RETRY_BACKOFF_MAX", 10.0))
+    ES_RETRY_ON_TIMEOUT: bool = os.getenv("ES_RETRY_ON_TIMEOUT", "true").lower() == "true"
+    ES_DEAD_NODE_BACKOFF: float = float(os.getenv("ES_DEAD_NODE_BACKOFF", 1.0))
+    ES_MAX_DEAD_NODE_BACKOFF: float = float(os.getenv("ES_MAX_DEAD_NODE_BACKOFF", 30.0))
+    ES_CONNECTIONS_PER_NODE: int = int(os.getenv("ES_CONNECTIONS_PER_NODE", 10))
+    ES_HTTP_COMPRESS: bool = os.getenv("ES_HTTP_COMPRESS", "true").lower() == "true"
+    ES_SNIFF: bool = os.getenv("ES_SNIFF", "false").lower() == "true"
+    HEALTH_CHECK_TIMEOUT: float = float(os.getenv("HEALTH_CHECK_TIMEOUT", 2.0))
+    SHUTDOWN_TIMEOUT: float = float(os.getenv("SHUTDOWN_TIMEOUT", 30))
+    ES_ROUTE_BY_USER: bool = os.getenv("ES_ROUTE_BY_USER", "false").lower() == "true"
+    ES_VECTOR_INDEX_TYPE: str = os.getenv("ES_VECTOR_INDEX_TYPE", "int8_hnsw")
+    ES_HNSW_M: int = int(os.getenv("ES_HNSW_M", 16))
+    ES_HNSW_EF_CONSTRUCTION: int = int(os.getenv("ES_HNSW_EF_CONSTRUCTION", 100))
+    ES_EXCLUDE_VECTORS_FROM_SOURCE: bool = os.getenv("ES_EXCLUDE_VECTORS_FROM_SOURCE", "true").lower() == "true"
+    ES_VECTOR_ENCODING: str = os.getenv("ES_VECTOR_ENCODING", "float")
+    ES_BULK_CHUNK_SIZE: int = int(os.getenv("ES_BULK_CHUNK_SIZE", 500))
+    ES_BULK_MAX_BYTES: int = int(os.getenv("ES_BULK_MAX_BYTES", 10 * 1024 * 1024))
+    ES_BULK_THREADS: int = int(os.getenv("ES_BULK_THREADS", 4))
+    ES_BULK_REFRESH_INTERVAL: str = os.getenv("ES_BULK_REFRESH_INTERVAL", "")
+    AUTH_CACHE_SIZE: int = int(os.getenv("AUTH_CACHE_SIZE", 10000))
+    AUTH_CACHE_TTL: float = float(os.getenv("AUTH_CACHE_TTL", 60))
+    SEARCH_CONCURRENCY: int = int(os.getenv("SEARCH_CONCURRENCY", 32))
+    EMBEDDING_THREADS: int = int(os.getenv("EMBEDDING_THREADS", 2))
+    SEARCH_MODE: str = os.getenv("SEARCH_MODE", "hybrid")
+    SEARCH_NUM_CANDIDATES: int = int(os.getenv("SEARCH_NUM_CANDIDATES", 50))
+    RRF_RANK_CONSTANT: int = int(os.getenv("RRF_RANK_CONSTANT", 60))
+    EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+    EMBEDDING_BACKEND: str = os.getenv("EMBEDDING_BACKEND", "torch")
+    EMBEDDING_ONNX_FILE: str = os.getenv("EMBEDDING_ONNX_FILE", "")
+    EMBEDDING_DIMS: int = int(os.getenv("EMBEDDING_DIMS", 384))
+    EMBEDDING_BATCH_SIZE: int = int(os.getenv("EMBEDDING_BATCH_SIZE", 64))
+    EMBEDDING_CACHE_SIZE: int = int(os.getenv("EMBEDDING_CACHE_SIZE", 50000))
+    EMBEDDING_CACHE_PATH: str = os.getenv("EMBEDDING_CACHE_PATH", "")
+    EMBEDDING_CACHE_DISK_SIZE: int = int(os.getenv("EMBEDDING_CACHE_DISK_SIZE", 1000000))
+    QUERY_CACHE_SIZE: int = int(os.getenv("QUERY_CACHE_SIZE", 10000))
+    RERANK_ENABLED: bool = os.getenv("RERANK_ENABLED", "false").lower() == "true"
+    RERANK_MODEL: str = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+    RERANK_CANDIDATES: int = int(os.getenv("RERANK_CANDIDATES", 30))
+    RERANK_BUDGET_MS: int = int(os.getenv("RERANK_BUDGET_MS", 150))
+    RERANK_BATCH_SIZE: int = int(os.getenv("RERANK_BATCH_SIZE", 32))
+    RERANK_MAX_LENGTH: int = int(os.getenv("RERANK_MAX_LENGTH", 256))
+    RERANK_THREADS: int = int(os.getenv("RERANK_THREADS", 2))
+    RERANK_CACHE_SIZE: int = int(os.getenv("RERANK_CACHE_SIZE", 50000))
+    QUERY_CACHE_TTL: float = float(os.getenv("QUERY_CACHE_TTL", 600))
+
+    EXTRACTION_WORKERS: int = int(os.getenv("EXTRACTION_WORKERS", os.cpu_count() or 1))
+    EXTRACTION_PAGES_PER_TASK: int = int(os.getenv("EXTRACTION_PAGES_PER_TASK", 8))
+    EXTRACTION_PARALLEL_MIN_PAGES: int = int(os.getenv("EXTRACTION_PARALLEL_MIN_PAGES", 16))
+    TABLE_STRATEGY: str = os.getenv("TABLE_STRATEGY", "lines")
+    TABLE_PRECHECK: bool = os.getenv("TABLE_PRECHECK", "true").lower() == "true"
+    TABLE_MIN_LINES: int = int(os.getenv("TABLE_MIN_LINES", 6))
+    TABLE_MIN_ROWS: int = int(os.getenv("TABLE_MIN_ROWS", 3))
+    TABLE_LINE_TOLERANCE: float = float(os.getenv("TABLE_LINE_TOLERANCE", 3))
+    TABLE_OVERLAP_RATIO: float = float(os.getenv("TABLE_OVERLAP_RATIO", 0.8))
+    OCR_MODE: str = os.getenv("OCR_MODE", "auto")
+    OCR_LANG: str = os.getenv("OCR_LANG", "eng")
+    OCR_THREADS: int = int(os.getenv("OCR_THREADS", 4))
+    OCR_MIN_IMAGE_SIZE: int = int(os.getenv("OCR_MIN_IMAGE_SIZE", 32))
+    OCR_MIN_IMAGE_AREA: int = int(os.getenv("OCR_MIN_IMAGE_AREA", 10000))
+    OCR_MAX_DPI: int = int(os.getenv("OCR_MAX_DPI", 300))
+    OCR_RENDER_DPI: int = int(os.getenv("OCR_RENDER_DPI", 300))
+    CHUNKING_ENABLED: bool = os.getenv("CHUNKING_ENABLED", "true").lower() == "true"
+    CHUNK_TARGET_TOKENS: int = int(os.getenv("CHUNK_TARGET_TOKENS", 200))
+    CHUNK_OVERLAP_TOKENS: int = int(os.getenv("CHUNK_OVERLAP_TOKENS", 32))
+    PIPELINE_QUEUE_SIZE: int = int(os.getenv("PIPELINE_QUEUE_SIZE", 4))
+    COMPACTION_INTERVAL: float = float(os.getenv("COMPACTION_INTERVAL", 0))
+    REQUEST_TIMING_LOG: bool = os.getenv("REQUEST_TIMING_LOG", "false").lower() == "true"
+    UPLOAD_DIR: str = os.getenv("UPLOAD_DIR", "uploads")
+    UPLOAD_MAX_BYTES: int = int(os.getenv("UPLOAD_MAX_BYTES", 200 * 1024 * 1024))
+    UPLOAD_CHUNK_SIZE: int = int(os.getenv("UPLOAD_CHUNK_SIZE", 1024 * 1024))
+    UPLOAD_MAX_FILES: int = int(os.getenv("UPLOAD_MAX_FILES", 100))
+    BATCH_FILES_PER_RUN: int = int(os.getenv("BATCH_FILES_PER_RUN", 16))
+    JOB_QUEUE_BACKEND: str = os.getenv("JOB_QUEUE_BACKEND", "memory")
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", 2))
+    JOB_POLL_INTERVAL: float = float(os.getenv("JOB_POLL_INTERVAL", 1.0))
+    JOB_STALE_AFTER: int = int(os.getenv("JOB_STALE_AFTER", 3600))
 
 settings = Settings()
@@ -1,4 +1,5 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.config.config import settings
@@ -6,20 +7,50 @@ from typing import Optional
 
 engine = None
 SessionLocal: Optional[sessionmaker] = None
+async_engine: Optional[AsyncEngine] = None
+AsyncSessionLocal: Optional[async_sessionmaker] = None
 
 Base = declarative_base()
 
 from app.models.user_model import User
 from app.models.document_model import PdfDocument
+from app.models.job_model import IngestionJob
+from app.models.page_model import PdfPage
+
+def async_database_url(url: str) -> str:
+    if url.startswith(("postgresql://", "postgres://")):
+        # asyncpg takes "ssl" where psycopg2 takes "sslmode"
+        return "postgresql+asyncpg://" + url.split("://", 1)[1].replace("sslmode=", "ssl=")
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    return url
+
+def pool_options(url: str) -> dict:
+    # SQLite connections are file handles, pool sizing only applies to server databases
+    if url.startswith("sqlite"):
+        return {}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+    }
 
 def init_db():
-    global engine, SessionLocal
+    global engine, SessionLocal, async_engine, AsyncSessionLocal
 
     if engine is None:
-        engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
+        engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True, **pool_options(settings.DATABASE_URL))
 
     if SessionLocal is None:
         SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    if async_engine is None:
+        async_url = settings.DATABASE_ASYNC_URL or async_database_url(settings.DATABASE_URL)
+        async_engine = create_async_engine(async_url, pool_pre_ping=True, **pool_options(async_url))
+
+    if AsyncSessionLocal is None:
+        AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
     
     create_all_tables()
     print("Database initialized successfully.")
@@ -27,12 +58,61 @@ def init_db():
 def create_all_tables():
     if engine is not None:
         Base.metadata.create_all(bind=engine)
+        add_missing_columns()
     
     print("All tables created or already exist.")
 
+def add_missing_columns():
+    # create_all only creates missing tables, so nullable columns and indexes added
+    # to existing models are applied here
+    inspector = inspect(engine)
+
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+
+            existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns or not column.nullable:
+                    continue
+
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                print(f"Added column {table.name}.{column.name}")
+
+            existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(bind=conn)
+                    print(f"Created index {index.name}")
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def ping_db() -> bool:
+    if async_engine is None:
+        return False
+    async with async_engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+    return True
+
+def pool_status() -> dict:
+    return {
+        "sync": engine.pool.status() if engine is not None else None,
+        "async": async_engine.pool.status() if async_engine is not None else None,
+    }
+
+async def close_db():
+    if async_engine is not None:
+        await async_engine.dispose()
+    if engine is not None:
+        engine.dispose()
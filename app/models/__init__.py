@@ -1,2 +1,4 @@
 from .user_model import User
 from .document_model import PdfDocument
+from .job_model import IngestionJob
+from .page_model import PdfPage
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Float, Index, Integer, String, DateTime, ForeignKey
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import UUID
 from app.db.database import Base
@@ -7,10 +7,20 @@ import uuid
 
 class PdfDocument(Base):
     __tablename__ = "pdf_documents"
+    __table_args__ = (
+        # Keyset pagination of a user's documents, newest first
+        Index("ix_pdf_documents_user_created_id", "user_id", "created_at", "id"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
     file_name = Column(String, nullable=False)
+    content_hash = Column(String(64), nullable=True, index=True)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    status = Column(String, nullable=True, default="ready")
+    page_count = Column(Integer, nullable=True)
+    block_count = Column(Integer, nullable=True)
+    ingest_duration = Column(Float, nullable=True)
 
     owner = relationship("User", back_populates="documents")
+    pages = relationship("PdfPage", back_populates="document", cascade="all, delete-orphan", passive_deletes=True)
@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Float, String, DateTime, ForeignKey, JSON
+from sqlalchemy.dialects.postgresql import UUID
+from app.db.database import Base
+import datetime
+import uuid
+
+class IngestionJob(Base):
+    __tablename__ = "ingestion_jobs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True)
+    pdf_id = Column(UUID(as_uuid=True), nullable=False)
+    batch_id = Column(UUID(as_uuid=True), nullable=True, index=True)
+    file_name = Column(String, nullable=False)
+    file_path = Column(String, nullable=False)
+    content_hash = Column(String(64), nullable=True)
+    kind = Column(String, nullable=True, default="ingest")
+    status = Column(String, nullable=False, default="queued", index=True)
+    progress = Column(Float, nullable=False, default=0.0)
+    stage_timings = Column(JSON, nullable=False, default=dict)
+    error = Column(String, nullable=True)
+    # Pages that failed extraction, by page number, in a job that otherwise completed
+    failed_pages = Column(JSON, nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
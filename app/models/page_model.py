@@ -0,0 +1,13 @@
+from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy.orm import relationship
+from sqlalchemy.dialects.postgresql import UUID
+from app.db.database import Base
+
+class PdfPage(Base):
+    __tablename__ = "pdf_pages"
+
+    pdf_id = Column(UUID(as_uuid=True), ForeignKey("pdf_documents.id", ondelete="CASCADE"), primary_key=True)
+    page_number = Column(Integer, primary_key=True)
+    content_hash = Column(String(64), nullable=False)
+
+    document = relationship("PdfDocument", back_populates="pages")
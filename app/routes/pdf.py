@@ -1,100 +1,251 @@
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from app.config.config import settings
 from sqlalchemy.orm import Session
-from app.schemas.pdf_schema import PdfDocumentCreate, PdfDocument
-from app.db.database import get_db
+from app.schemas.pdf_schema import PdfDocumentField, PdfDocumentSummary
+from app.schemas.job_schema import IngestionBatch, IngestionJobCreate, IngestionJob
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.database import get_async_db, get_db
 from app.utils.auth import get_current_user
+from app.utils.upload import save_upload
 from app.models.user_model import User
-from app.services.pdf_extractor import extract_pdf_content
-from app.services.pdf import create_pdf_document, get_pdf_document, get_user_pdfs
+from app.services.pdf import delete_pdf_document, get_pdf_document, list_user_pdfs
+from app.services.identity_cache import user_owns_pdf
+from app.services.job import create_job, get_batch_jobs, get_job, summarize_batch
+from app.services.job_queue import job_queue
 from app.services.embedding import embedding_service
-from app.services.elastic_search import ElasticSearchDocument, ElasticSearchResponse, SearchRequest, search_service
+from app.services.search_backend import ElasticSearchResponse, SearchRequest
+from app.services.search import search_service
+from app.services.reranker import rerank_with_budget
+from app.utils.concurrency import run_in_embedding_executor, search_semaphore
+from app.utils.metrics import observe_stage
 import uuid
-from typing import List
+from typing import List, Optional
 
 router = APIRouter()
 
-@router.post("/upload-pdf", response_model=PdfDocument)
+@router.post("/upload-pdf", response_model=IngestionJob, status_code=202)
 async def upload_pdf(
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    if file.content_type != "application/pdf":
-        return {"error": "Invalid file type. Only PDF files are allowed."}
-    
     try:
-        pdf_file = await file.read()
+        job_id = uuid.uuid4()
+        file_path, content_hash = await save_upload(job_id, file)
 
-        extracted_data = extract_pdf_content(pdf_file)
+        job = await run_in_threadpool(create_job, IngestionJobCreate(
+            id=job_id,
+            user_id=current_user.id,
+            pdf_id=uuid.uuid4(),
+            file_name=file.filename,
+            file_path=file_path,
+            content_hash=content_hash,
+        ), db)
 
+        job_queue.enqueue(job.id)
 
-        if extracted_data.error:
-            raise HTTPException(status_code=500, detail=f"Error extracting PDF content: {extracted_data.error}")
-        
-        pdf_id = uuid.uuid4()
+        return job
 
+    except HTTPException:
+        raise
 
-        db_pdf = PdfDocumentCreate(
-            id=pdf_id,
-            user_id=current_user.id,
-            file_name=file.filename,
-        )
-
-        response = create_pdf_document(db_pdf, db)
-
-        if response is None:
-            raise HTTPException(status_code=500, detail="Error saving PDF document to the database.")
-
-        results: List[ElasticSearchDocument] = []
-        for item in extracted_data.all_content:
-            embedding = embedding_service.create_embedding(item.content)
-            es_doc = ElasticSearchDocument(
-                pdf_id=pdf_id,
-                type=item.type,
-                page_number=item.page_number,
-                block_index=item.block_index,
-                content=item.content,
-                embedding=embedding
-            )
-            results.append(es_doc)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error uploading PDF: {str(e)}")
 
-        search_service.index_document(results)
+@router.post("/upload-pdfs", response_model=IngestionBatch, status_code=202)
+async def upload_pdfs(
+    files: List[UploadFile] = File(...),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    if len(files) > settings.UPLOAD_MAX_FILES:
+        raise HTTPException(status_code=413, detail=f"Too many files. Maximum is {settings.UPLOAD_MAX_FILES} per batch.")
 
-        return response
+    batch_id = uuid.uuid4()
+    jobs = []
+    rejected = {}
+
+    try:
+        # Invalid files are reported back per file instead of failing the whole batch
+        for file in files:
+            job_id = uuid.uuid4()
+            try:
+                file_path, content_hash = await save_upload(job_id, file)
+            except HTTPException as e:
+                rejected[file.filename] = e.detail
+                continue
+
+            jobs.append(await run_in_threadpool(create_job, IngestionJobCreate(
+                id=job_id,
+                user_id=current_user.id,
+                pdf_id=uuid.uuid4(),
+                batch_id=batch_id,
+                file_name=file.filename,
+                file_path=file_path,
+                content_hash=content_hash,
+            ), db))
+
+        for job in jobs:
+            job_queue.enqueue(job.id)
+
+        return summarize_batch(batch_id, jobs, rejected)
 
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error uploading/processing PDF: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error uploading PDFs: {str(e)}")
+
+@router.get("/batches/{batch_id}", response_model=IngestionBatch)
+def fetch_batch(
+    batch_id: uuid.UUID,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    jobs = [job for job in get_batch_jobs(batch_id, db) if job.user_id == current_user.id]
+
+    if not jobs:
+        raise HTTPException(status_code=404, detail="Batch not found or access denied.")
+
+    return summarize_batch(batch_id, jobs)
+
+@router.get("/jobs/{job_id}", response_model=IngestionJob)
+def fetch_job(
+    job_id: uuid.UUID,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    job = get_job(job_id, db)
+
+    if not job or job.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Job not found or access denied.")
+
+    return job
     
 
 @router.post("/search", response_model=List[ElasticSearchResponse])
 async def search(
     search_request: SearchRequest,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    try:
-        query_embedding = embedding_service.create_embedding(search_request.query)
+    rerank = settings.RERANK_ENABLED if search_request.rerank is None else search_request.rerank
+    topk = search_request.topk
+    if rerank:
+        # The first stage fetches a larger candidate pool for the cross-encoder to reorder
+        topk = max(topk, search_request.rerank_candidates or settings.RERANK_CANDIDATES)
 
-        if search_request.pdf_id:
-            pdf_doc = get_pdf_document(search_request.pdf_id, db)
-            if not pdf_doc or pdf_doc.user_id != current_user.id:
-                raise HTTPException(status_code=404, detail="PDF document not found or access denied.")
-            
-        search_results = search_service.search(pdf_id=search_request.pdf_id, query_embedding=query_embedding)
-        print(search_service.es.ping())
+    try:
+        async with search_semaphore:
+            with observe_stage("query_embed"):
+                query_embedding = await run_in_embedding_executor(embedding_service.create_query_embedding, search_request.query)
+
+            if search_request.pdf_id:
+                if not await user_owns_pdf(current_user.id, search_request.pdf_id, db):
+                    raise HTTPException(status_code=404, detail="PDF document not found or access denied.")
+
+            with observe_stage("search"):
+                search_results = await search_service.search(
+                    user_id=current_user.id,
+                    pdf_id=search_request.pdf_id,
+                    query_embedding=query_embedding,
+                    topk=topk,
+                    query_text=search_request.query,
+                    mode=search_request.mode,
+                    fusion=search_request.fusion,
+                    k=search_request.k,
+                    num_candidates=search_request.num_candidates,
+                    knn_weight=search_request.knn_weight,
+                    highlight=search_request.highlight,
+                    group_by=search_request.group_by,
+                    inner_hits=search_request.inner_hits
+                )
+
+        if rerank and search_results:
+            search_results = await rerank_with_budget(
+                search_request.query,
+                search_results,
+                search_request.topk,
+                search_request.rerank_budget_ms or settings.RERANK_BUDGET_MS
+            )
 
         return search_results
 
+    except HTTPException:
+        raise
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error searching PDF: {str(e)}")
     
-@router.get("/pdfs", response_model=List[PdfDocument])
+@router.get("/pdfs", response_model=List[PdfDocumentSummary], response_model_exclude_unset=True)
 def fetch_user_pdfs(
+    response: Response,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    fields: Optional[List[PdfDocumentField]] = Query(None),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     try:
-        user_pdfs = get_user_pdfs(current_user.id, db)
-        return user_pdfs
+        user_pdfs, next_cursor = list_user_pdfs(current_user.id, db, limit=limit, cursor=cursor, fields=fields)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching user PDFs: {str(e)}")
+
+    # The body stays a plain list, the cursor of the next page is sent as a header
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+
+    return [PdfDocumentSummary(**pdf) for pdf in user_pdfs]
+
+@router.delete("/pdfs/{pdf_id}", status_code=204)
+def delete_pdf(
+    pdf_id: uuid.UUID,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    pdf_doc = get_pdf_document(pdf_id, db)
+
+    if not pdf_doc or pdf_doc.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="PDF document not found or access denied.")
+
+    try:
+        search_service.delete_pdf_blocks([pdf_id])
+        delete_pdf_document(pdf_doc, db)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error deleting PDF: {str(e)}")
+
+@router.post("/pdfs/{pdf_id}/reprocess", response_model=IngestionJob, status_code=202)
+async def reprocess_pdf(
+    pdf_id: uuid.UUID,
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    pdf_doc = await run_in_threadpool(get_pdf_document, pdf_id, db)
+
+    if not pdf_doc or pdf_doc.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="PDF document not found or access denied.")
+
+    try:
+        job_id = uuid.uuid4()
+        file_path, content_hash = await save_upload(job_id, file)
+
+        job = await run_in_threadpool(create_job, IngestionJobCreate(
+            id=job_id,
+            user_id=current_user.id,
+            pdf_id=pdf_id,
+            file_name=file.filename,
+            file_path=file_path,
+            content_hash=content_hash,
+            kind="reprocess",
+        ), db)
+
+        job_queue.enqueue(job.id)
+
+        return job
+
+    except HTTPException:
+        raise
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error uploading PDF: {str(e)}")
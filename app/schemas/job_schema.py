@@ -0,0 +1,43 @@
+from pydantic import BaseModel
+from typing import Dict, List, Literal, Optional
+import uuid
+from datetime import datetime
+
+JobStatus = Literal["queued", "running", "completed", "failed"]
+JobKind = Literal["ingest", "reprocess"]
+
+class IngestionJobCreate(BaseModel):
+    id: uuid.UUID
+    user_id: uuid.UUID
+    pdf_id: uuid.UUID
+    file_name: str
+    file_path: str
+    content_hash: Optional[str] = None
+    kind: JobKind = "ingest"
+    batch_id: Optional[uuid.UUID] = None
+
+class IngestionJob(BaseModel):
+    id: uuid.UUID
+    user_id: uuid.UUID
+    pdf_id: uuid.UUID
+    batch_id: Optional[uuid.UUID] = None
+    file_name: str
+    kind: Optional[JobKind] = "ingest"
+    status: JobStatus
+    progress: float
+    stage_timings: Dict[str, float] = {}
+    error: Optional[str] = None
+    failed_pages: Optional[Dict[int, str]] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class IngestionBatch(BaseModel):
+    id: uuid.UUID
+    total: int
+    status_counts: Dict[JobStatus, int] = {}
+    jobs: List[IngestionJob] = []
+    rejected: Dict[str, str] = {}
@@ -1,4 +1,5 @@
 from pydantic import BaseModel
+from typing import Literal, Optional
 import uuid
 from datetime import datetime
 
@@ -6,9 +7,29 @@ class PdfDocumentCreate(BaseModel):
     id: uuid.UUID
     user_id: uuid.UUID
     file_name: str
+    content_hash: Optional[str] = None
+    status: str = "ready"
+    page_count: Optional[int] = None
+    block_count: Optional[int] = None
+    ingest_duration: Optional[float] = None
 
 class PdfDocument(PdfDocumentCreate):
     created_at: datetime
+    status: Optional[str] = None
 
     class Config:
         from_attributes = True
+
+PdfDocumentField = Literal["id", "user_id", "file_name", "content_hash", "created_at", "status", "page_count", "block_count", "ingest_duration"]
+
+# Listing item, only the requested fields are set
+class PdfDocumentSummary(BaseModel):
+    id: Optional[uuid.UUID] = None
+    user_id: Optional[uuid.UUID] = None
+    file_name: Optional[str] = None
+    content_hash: Optional[str] = None
+    created_at: Optional[datetime] = None
+    status: Optional[str] = None
+    page_count: Optional[int] = None
+    block_count: Optional[int] = None
+    ingest_duration: Optional[float] = None
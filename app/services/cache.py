@@ -0,0 +1,176 @@
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+import hashlib
+import numpy as np
+import os
+import sqlite3
+import threading
+import time
+from app.utils.metrics import cache_requests_total
+
+class CacheStats:
+    def __init__(self, name: Optional[str] = None):
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def record(self, hits: int = 0, misses: int = 0):
+        with self.lock:
+            self.hits += hits
+            self.misses += misses
+
+        if self.name:
+            cache_requests_total.labels(cache=self.name, result="hit").inc(hits)
+            cache_requests_total.labels(cache=self.name, result="miss").inc(misses)
+
+    def as_dict(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+class LRUCache:
+    def __init__(self, max_size: int, ttl: Optional[float] = None, name: Optional[str] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries: "OrderedDict[Hashable, Tuple[Optional[float], object]]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = CacheStats(name)
+
+    def get(self, key: Hashable):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.stats.record(misses=1)
+                return None
+
+            expires_at, value = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self.entries[key]
+                self.stats.record(misses=1)
+                return None
+
+            self.entries.move_to_end(key)
+            self.stats.record(hits=1)
+            return value
+
+    def put(self, key: Hashable, value):
+        if self.max_size <= 0:
+            return
+
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+
+        with self.lock:
+            self.entries[key] = (expires_at, value)
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+class DiskVectorStore:
+    def __init__(self, path: str, max_size: int):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.stats = CacheStats("embedding_disk")
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS vectors (key TEXT PRIMARY KEY, vector BLOB NOT NULL, accessed REAL NOT NULL)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS vectors_accessed ON vectors (accessed)")
+        self.conn.commit()
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found: Dict[str, np.ndarray] = {}
+
+        with self.lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = self.conn.execute(
+                    f"SELECT key, vector FROM vectors WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for key, vector in rows:
+                    found[key] = np.frombuffer(vector, dtype=np.float32)
+
+            if found:
+                now = time.time()
+                self.conn.executemany("UPDATE vectors SET accessed = ? WHERE key = ?", [(now, key) for key in found])
+                self.conn.commit()
+
+        self.stats.record(hits=len(found), misses=len(keys) - len(found))
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]):
+        if not items or self.max_size <= 0:
+            return
+
+        now = time.time()
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO vectors (key, vector, accessed) VALUES (?, ?, ?)",
+                [(key, np.asarray(vector, dtype=np.float32).tobytes(), now) for key, vector in items.items()]
+            )
+            count = self.conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+            if count > self.max_size:
+                self.conn.execute(
+                    "DELETE FROM vectors WHERE key IN (SELECT key FROM vectors ORDER BY accessed LIMIT ?)",
+                    (count - self.max_size,)
+                )
+            self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+class EmbeddingCache:
+    def __init__(self, model_name: str, memory_size: int, disk_path: Optional[str] = None, disk_size: int = 0):
+        self.model_name = model_name
+        self.memory = LRUCache(memory_size, name="embedding_memory")
+        self.disk = DiskVectorStore(disk_path, disk_size) if disk_path else None
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, np.ndarray]:
+        found: Dict[str, np.ndarray] = {}
+        missing: List[str] = []
+
+        for key in keys:
+            vector = self.memory.get(key)
+            if vector is None:
+                missing.append(key)
+            else:
+                found[key] = vector
+
+        if self.disk and missing:
+            from_disk = self.disk.get_many(missing)
+            for key, vector in from_disk.items():
+                self.memory.put(key, vector)
+            found.update(from_disk)
+
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]):
+        for key, vector in items.items():
+            self.memory.put(key, vector)
+
+        if self.disk:
+            self.disk.put_many(items)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        stats = {"memory": {**self.memory.stats.as_dict(), "size": len(self.memory)}}
+        if self.disk:
+            stats["disk"] = self.disk.stats.as_dict()
+        return stats
@@ -0,0 +1,78 @@
+from app.config.config import settings
+from app.services.pdf_extractor import ExtractedContentFormat
+from typing import List, Optional
+
+class Chunker:
+    def __init__(self, tokenizer, target_tokens: int, overlap_tokens: int):
+        self.tokenizer = tokenizer
+        self.target_tokens = target_tokens
+        self.overlap_tokens = min(overlap_tokens, target_tokens // 2)
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        if not texts:
+            return []
+        encoded = self.tokenizer(texts, add_special_tokens=False)["input_ids"]
+        return [len(ids) for ids in encoded]
+
+    def split(self, item: ExtractedContentFormat) -> List[ExtractedContentFormat]:
+        # Cut on the tokenizer's character offsets so the chunks keep the original text
+        offsets = self.tokenizer(item.content, add_special_tokens=False, return_offsets_mapping=True)["offset_mapping"]
+        stride = self.target_tokens - self.overlap_tokens
+        chunks: List[ExtractedContentFormat] = []
+
+        for chunk_index, start in enumerate(range(0, len(offsets), stride)):
+            window = offsets[start:start + self.target_tokens]
+            content = item.content[window[0][0]:window[-1][1]].strip()
+            if content:
+                chunks.append(item.model_copy(update={"content": content, "chunk_index": chunk_index}))
+
+            if start + self.target_tokens >= len(offsets):
+                break
+
+        return chunks
+
+    def merge(self, items: List[ExtractedContentFormat]) -> ExtractedContentFormat:
+        if len(items) == 1:
+            return items[0]
+
+        return items[0].model_copy(update={
+            "content": "\n".join(item.content for item in items),
+            "block_end_index": items[-1].block_index,
+        })
+
+    def chunk_page(self, page_content: List[ExtractedContentFormat]) -> List[ExtractedContentFormat]:
+        chunks: List[ExtractedContentFormat] = []
+        pending: List[ExtractedContentFormat] = []
+        pending_tokens = 0
+
+        def flush():
+            nonlocal pending, pending_tokens
+            if pending:
+                chunks.append(self.merge(pending))
+            pending, pending_tokens = [], 0
+
+        for item, tokens in zip(page_content, self.count_tokens([item.content for item in page_content])):
+            if tokens > self.target_tokens:
+                flush()
+                chunks.extend(self.split(item))
+                continue
+
+            # Only consecutive text blocks of one page are merged, tables and OCR'd images stay whole
+            if item.type != "text":
+                flush()
+                chunks.append(item)
+                continue
+
+            if pending and (pending[-1].page_number != item.page_number or pending_tokens + tokens > self.target_tokens):
+                flush()
+
+            pending.append(item)
+            pending_tokens += tokens
+
+        flush()
+        return chunks
+
+def create_chunker(tokenizer) -> Optional[Chunker]:
+    if not settings.CHUNKING_ENABLED:
+        return None
+    return Chunker(tokenizer, settings.CHUNK_TARGET_TOKENS, settings.CHUNK_OVERLAP_TOKENS)
@@ -0,0 +1,94 @@
+from app.config.config import settings
+from app.db import database
+from app.services.search import search_service
+from app.services.job import get_active_pdf_ids
+from app.services.pdf import get_all_pdf_ids, get_pdf_document
+from pydantic import BaseModel
+from typing import List, Optional
+import threading
+import uuid
+
+class CompactionReport(BaseModel):
+    indexed_pdf_ids: int
+    orphaned_pdf_ids: List[uuid.UUID]
+    deleted_blocks: int
+    backfilled_pdf_ids: int = 0
+    merged_segments: int = 0
+    dry_run: bool
+
+def backfill_pdf_owners(db, dry_run: bool = False) -> int:
+    # Blocks indexed before they carried a user_id are invisible to scoped searches
+    backfilled = 0
+
+    for pdf_id in list(search_service.iter_unowned_pdf_ids()):
+        pdf_doc = get_pdf_document(pdf_id, db)
+        if pdf_doc is None:
+            continue
+
+        if not dry_run:
+            search_service.set_pdf_owner(pdf_id, pdf_doc.user_id)
+        backfilled += 1
+
+    return backfilled
+
+def run_compaction(dry_run: bool = False) -> CompactionReport:
+    # The index is listed before the database so that a PDF still being ingested
+    # is always seen as an active job (or a finished document), never as an orphan
+    indexed_pdf_ids = list(search_service.iter_indexed_pdf_ids())
+
+    db = database.SessionLocal()
+    try:
+        known_pdf_ids = get_all_pdf_ids(db) | get_active_pdf_ids(db)
+        backfilled_pdf_ids = backfill_pdf_owners(db, dry_run)
+    finally:
+        db.close()
+
+    orphaned_pdf_ids = [pdf_id for pdf_id in indexed_pdf_ids if pdf_id not in known_pdf_ids]
+
+    deleted_blocks = 0
+    if orphaned_pdf_ids and not dry_run:
+        for start in range(0, len(orphaned_pdf_ids), 500):
+            deleted_blocks += search_service.delete_pdf_blocks(orphaned_pdf_ids[start:start + 500])
+
+    # The local backend's appends leave a few segments per tenant, these are merged into one
+    merged_segments = search_service.merge_segments() if not dry_run else 0
+
+    report = CompactionReport(
+        indexed_pdf_ids=len(indexed_pdf_ids),
+        orphaned_pdf_ids=orphaned_pdf_ids,
+        deleted_blocks=deleted_blocks,
+        backfilled_pdf_ids=backfilled_pdf_ids,
+        merged_segments=merged_segments,
+        dry_run=dry_run
+    )
+    print(f"Compaction: {len(orphaned_pdf_ids)} orphaned of {len(indexed_pdf_ids)} indexed PDFs, {deleted_blocks} blocks deleted, {backfilled_pdf_ids} PDFs given an owner, {merged_segments} segments merged.")
+    return report
+
+class CompactionScheduler:
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.thread: Optional[threading.Thread] = None
+        self.stop_event = threading.Event()
+
+    def start(self):
+        if self.interval <= 0:
+            return
+
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, name="compaction", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+            self.thread = None
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                run_compaction()
+            except Exception as e:
+                print(f"Error running compaction: {e}")
+
+compaction_scheduler = CompactionScheduler(settings.COMPACTION_INTERVAL)
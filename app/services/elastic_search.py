@@ -1,117 +1,529 @@
-from elasticsearch import Elasticsearch
+from elasticsearch import AsyncElasticsearch, Elasticsearch, helpers
+from elastic_transport import AsyncTransport, ConnectionError, ConnectionTimeout, Transport
+from elastic_transport.client_utils import DEFAULT
 from app.config.config import settings
+from app.services.embedding import embedding_service
+import base64
+import bisect
+import threading
+import asyncio
+import numpy as np
+import random
+import time
 import uuid
-from app.services.pdf_extractor import ExtractedContentFormat
-from typing import List, Optional
-from pydantic import BaseModel
-
-class SearchRequest(BaseModel):
-    query: str
-    pdf_id: Optional[uuid.UUID] = None
-
-class ElasticSearchDocument(ExtractedContentFormat):
-    pdf_id: uuid.UUID
-    embedding: List[float]
-
-class ElasticSearchResponse(BaseModel):
-    pdf_id: uuid.UUID
-    type: str
-    page_number: int
-    block_index: int
-    content: str
-
-class ElasticSearchService:
+from contextlib import contextmanager
+from app.services.search_backend import (
+    BulkIndexResult,
+    ElasticSearchDocument,
+    ElasticSearchResponse,
+    SearchBackend,
+    GroupBy,
+    group_key,
+    hits_to_responses,
+    reciprocal_rank_fusion,
+)
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Fields added to the mapping after the first release, an index created before them
+# gets them through put_mapping instead of a dynamic mapping on first use
+UPGRADE_FIELDS = ("user_id", "page_key", "chunk_index", "block_end_index")
+
+def retry_delay(attempt: int) -> float:
+    # Exponential backoff with full jitter, so clients retrying together don't stay in step
+    return random.uniform(0, min(settings.ES_RETRY_BACKOFF_MAX, settings.ES_RETRY_BACKOFF * 2 ** attempt))
+
+def retry_plan(transport, max_retries, retry_on_status, retry_on_timeout):
+    max_retries = transport.max_retries if max_retries is DEFAULT else max_retries
+    retry_on_status = transport.retry_on_status if retry_on_status is DEFAULT else retry_on_status
+    retry_on_timeout = transport.retry_on_timeout if retry_on_timeout is DEFAULT else retry_on_timeout
+    return max_retries, retry_on_status, retry_on_timeout
+
+def should_retry(error: Exception, retry_on_timeout: bool) -> bool:
+    return isinstance(error, ConnectionError) or (retry_on_timeout and isinstance(error, ConnectionTimeout))
+
+# The stock transport retries immediately, these make every attempt after the first wait.
+# Each attempt goes through the parent with retries off, retryable statuses come back as responses
+class BackoffTransport(Transport):
+    def perform_request(self, method, target, *, max_retries=DEFAULT, retry_on_status=DEFAULT, retry_on_timeout=DEFAULT, **kwargs):
+        max_retries, retry_on_status, retry_on_timeout = retry_plan(self, max_retries, retry_on_status, retry_on_timeout)
+
+        for attempt in range(max_retries + 1):
+            try:
+                response = super().perform_request(method, target, max_retries=0, retry_on_status=retry_on_status, retry_on_timeout=retry_on_timeout, **kwargs)
+                if response.meta.status not in retry_on_status or attempt == max_retries:
+                    return response
+            except (ConnectionError, ConnectionTimeout) as e:
+                if attempt == max_retries or not should_retry(e, retry_on_timeout):
+                    raise
+            time.sleep(retry_delay(attempt))
+
+class AsyncBackoffTransport(AsyncTransport):
+    async def perform_request(self, method, target, *, max_retries=DEFAULT, retry_on_status=DEFAULT, retry_on_timeout=DEFAULT, **kwargs):
+        max_retries, retry_on_status, retry_on_timeout = retry_plan(self, max_retries, retry_on_status, retry_on_timeout)
+
+        for attempt in range(max_retries + 1):
+            try:
+                response = await super().perform_request(method, target, max_retries=0, retry_on_status=retry_on_status, retry_on_timeout=retry_on_timeout, **kwargs)
+                if response.meta.status not in retry_on_status or attempt == max_retries:
+                    return response
+            except (ConnectionError, ConnectionTimeout) as e:
+                if attempt == max_retries or not should_retry(e, retry_on_timeout):
+                    raise
+            await asyncio.sleep(retry_delay(attempt))
+
+class ElasticSearchService(SearchBackend):
     es: Optional[Elasticsearch] = None
+    async_es: Optional[AsyncElasticsearch] = None
 
     def __init__(self):
-        self.es = Elasticsearch(
-            hosts=[settings.ES_HOST],
-            api_key=settings.ES_API_KEY
-        )
+        # The sync client serves ingestion workers, request handlers use the async one
+        self.es = Elasticsearch(**self.client_options(), transport_class=BackoffTransport)
+        self.async_es = AsyncElasticsearch(**self.client_options(), transport_class=AsyncBackoffTransport)
+        self.index_ready = False
+        # Concurrent jobs share one refresh override per index, the first one in sets it
+        # and the last one out restores the value it replaced
+        self.refresh_lock = threading.Lock()
+        self.refresh_overrides: Dict[str, Tuple[int, Optional[str]]] = {}
 
-    def create_index(self):
-        if not self.es.indices.exists(index=settings.INDEX_NAME):
-            self.es.indices.create(
-                index=settings.INDEX_NAME,
-                body={
-                    "mappings": {
-                        "properties": {
-                            "pdf_id": {"type": "keyword"},
-                            "type": {"type": "keyword"},
-                            "content": {"type": "text"},
-                            "page_number": {"type": "integer"},
-                            "block_index": {"type": "integer"},
-                            "embedding": {
-                                "type": "dense_vector",
-                                "dims": 384,
-                                "index": True,
-                                "similarity": "cosine"
-                            }
-                            
-                        }
-                    }
+    def client_options(self) -> dict:
+        options = {
+            "hosts": [settings.ES_HOST],
+            "api_key": settings.ES_API_KEY,
+            "request_timeout": settings.ES_REQUEST_TIMEOUT,
+            "max_retries": settings.ES_MAX_RETRIES,
+            "retry_on_timeout": settings.ES_RETRY_ON_TIMEOUT,
+            # With several nodes (or sniffing), a node that failed is skipped for an exponentially
+            # growing period. A single node is always retried, the transport backs off instead
+            "dead_node_backoff_factor": settings.ES_DEAD_NODE_BACKOFF,
+            "max_dead_node_backoff": settings.ES_MAX_DEAD_NODE_BACKOFF,
+            "connections_per_node": settings.ES_CONNECTIONS_PER_NODE,
+            "http_compress": settings.ES_HTTP_COMPRESS,
+        }
+        if settings.ES_SNIFF:
+            options.update(sniff_on_start=True, sniff_on_node_failure=True, min_delay_between_sniffing=60)
+        return options
+
+    def index_body(self) -> dict:
+        index_options = {"type": settings.ES_VECTOR_INDEX_TYPE}
+        if "hnsw" in settings.ES_VECTOR_INDEX_TYPE:
+            index_options["m"] = settings.ES_HNSW_M
+            index_options["ef_construction"] = settings.ES_HNSW_EF_CONSTRUCTION
+
+        mappings = {
+            "properties": {
+                "pdf_id": {"type": "keyword"},
+                "user_id": {"type": "keyword"},
+                "type": {"type": "keyword"},
+                "content": {"type": "text"},
+                "page_number": {"type": "integer"},
+                "page_key": {"type": "keyword"},
+                "block_index": {"type": "integer"},
+                "block_end_index": {"type": "integer"},
+                "chunk_index": {"type": "integer"},
+                "embedding": {
+                    "type": "dense_vector",
+                    "dims": settings.EMBEDDING_DIMS,
+                    "index": True,
+                    "similarity": "cosine",
+                    "index_options": index_options
                 }
-            )
+            }
+        }
+        # The HNSW graph keeps its own copy of the vectors, _source doesn't need another one
+        if settings.ES_EXCLUDE_VECTORS_FROM_SOURCE:
+            mappings["_source"] = {"excludes": ["embedding"]}
+
+        return {"mappings": mappings}
+
+    def create_index(self, index_name: Optional[str] = None):
+        if self.index_ready and index_name is None:
+            return
+
+        target = index_name or settings.INDEX_NAME
+        if not self.es.indices.exists(index=target):
+            self.es.indices.create(index=target, body=self.index_body())
+        else:
+            self.update_mapping(target)
+
+        if index_name is None:
+            self.index_ready = True
+
+    def update_mapping(self, index_name: str):
+        properties = self.index_body()["mappings"]["properties"]
+        expected = {field: properties[field] for field in UPGRADE_FIELDS}
 
-    def index_document(self, documents: List[ElasticSearchDocument]):
-        self.create_index()
+        response = self.es.indices.get_mapping(index=index_name)
+        # An alias can point at several indices, every one of them needs the fields
+        for name, index in response.items():
+            existing = index.get("mappings", {}).get("properties", {})
 
+            # A dynamically mapped user_id is text, term filters on it never match
+            conflicts = [
+                f"{field} is {existing[field].get('type', 'object')}, expected {mapping['type']}"
+                for field, mapping in expected.items()
+                if field in existing and existing[field].get("type") != mapping["type"]
+            ]
+            if conflicts:
+                raise RuntimeError(
+                    f"Index {name} has incompatible mappings ({'; '.join(conflicts)}). "
+                    f"Run python -m app.cli reindex into a new index."
+                )
+
+            missing = {field: mapping for field, mapping in expected.items() if field not in existing}
+            if missing:
+                self.es.indices.put_mapping(index=name, properties=missing)
+                print(f"Added {', '.join(missing)} to the mapping of {name}.")
+
+    @contextmanager
+    def refresh_interval_override(self, refresh_interval: Optional[str], index_name: str):
+        if not refresh_interval:
+            yield
+            return
+
+        with self.refresh_lock:
+            holders, previous = self.refresh_overrides.get(index_name, (0, None))
+            if holders == 0:
+                current = self.es.indices.get_settings(index=index_name, name="index.refresh_interval")
+                previous = next(iter(current.values()), {}).get("settings", {}).get("index", {}).get("refresh_interval")
+                # Left over by a run that didn't finish, None puts back the index default
+                if previous == refresh_interval:
+                    previous = None
+                self.es.indices.put_settings(index=index_name, settings={"index": {"refresh_interval": refresh_interval}})
+            self.refresh_overrides[index_name] = (holders + 1, previous)
+
+        try:
+            yield
+        finally:
+            with self.refresh_lock:
+                holders, previous = self.refresh_overrides.pop(index_name)
+                if holders > 1:
+                    self.refresh_overrides[index_name] = (holders - 1, previous)
+                else:
+                    self.es.indices.put_settings(index=index_name, settings={"index": {"refresh_interval": previous}})
+
+    def encode_vector(self, embedding: List[float]):
+        if settings.ES_VECTOR_ENCODING == "base64":
+            # Big-endian float32 bytes, about a third of the size of the JSON float list
+            return base64.b64encode(np.asarray(embedding, dtype=">f4").tobytes()).decode("ascii")
+        return embedding
+
+    def bulk_actions(self, documents: Iterable[ElasticSearchDocument], index_name: str, pdf_runs: Optional[List[Tuple[int, str]]] = None):
+        position = 0
         for doc in documents:
             if not doc.content.strip():
                 continue
 
-            es_doc = ElasticSearchDocument(
-                pdf_id=doc.pdf_id,
-                type=doc.type,
-                page_number=doc.page_number,
-                block_index=doc.block_index,
-                content=doc.content,
-                embedding=doc.embedding
+            # Position of the first action of every PDF, consecutive actions mostly share one
+            if pdf_runs is not None and (not pdf_runs or pdf_runs[-1][1] != str(doc.pdf_id)):
+                pdf_runs.append((position, str(doc.pdf_id)))
+            position += 1
+
+            action = {
+                "_index": index_name,
+                "_source": {
+                    "pdf_id": str(doc.pdf_id),
+                    "user_id": str(doc.user_id) if doc.user_id else None,
+                    "type": doc.type,
+                    "page_number": doc.page_number,
+                    "page_key": f"{doc.pdf_id}:{doc.page_number}",
+                    "block_index": doc.block_index,
+                    "block_end_index": doc.block_end_index,
+                    "chunk_index": doc.chunk_index,
+                    "content": doc.content,
+                    "error": doc.error,
+                    "embedding": self.encode_vector(doc.embedding)
+                }
+            }
+            # Routing by owner keeps all of a user's blocks on one shard
+            if settings.ES_ROUTE_BY_USER and doc.user_id:
+                action["_routing"] = str(doc.user_id)
+
+            yield action
+
+    def index_document(
+        self,
+        documents: Iterable[ElasticSearchDocument],
+        chunk_size: Optional[int] = None,
+        max_chunk_bytes: Optional[int] = None,
+        thread_count: Optional[int] = None,
+        refresh_interval: Optional[str] = None,
+        index_name: Optional[str] = None
+    ) -> BulkIndexResult:
+        self.create_index(index_name)
+        index_name = index_name or settings.INDEX_NAME
+
+        result = BulkIndexResult()
+        # parallel_bulk reports results in the order of the actions, which is how failed items
+        # are traced back to the PDF they belong to
+        pdf_runs: List[Tuple[int, str]] = []
+        refresh_interval = refresh_interval if refresh_interval is not None else settings.ES_BULK_REFRESH_INTERVAL
+
+        with self.refresh_interval_override(refresh_interval, index_name):
+            for position, (ok, item) in enumerate(helpers.parallel_bulk(
+                self.es,
+                self.bulk_actions(documents, index_name, pdf_runs),
+                thread_count=thread_count or settings.ES_BULK_THREADS,
+                chunk_size=chunk_size or settings.ES_BULK_CHUNK_SIZE,
+                max_chunk_bytes=max_chunk_bytes or settings.ES_BULK_MAX_BYTES,
+                raise_on_error=False,
+                raise_on_exception=False
+            )):
+                if ok:
+                    result.indexed += 1
+                else:
+                    run = bisect.bisect_right(pdf_runs, position, key=lambda pdf_run: pdf_run[0]) - 1
+                    result.errors.append({**item, "pdf_id": pdf_runs[run][1]})
+
+        if result.errors:
+            print(f"Bulk indexing finished with {len(result.errors)} failed items.")
+
+        return result
+
+
+    def iter_pdf_blocks(self, pdf_id: Optional[uuid.UUID] = None, index_name: Optional[str] = None) -> Iterator[ElasticSearchDocument]:
+        # Blocks come back without an embedding when the index excludes vectors from _source
+        query = {"term": {"pdf_id": str(pdf_id)}} if pdf_id else {"match_all": {}}
+
+        for hit in helpers.scan(
+            self.es,
+            index=index_name or settings.INDEX_NAME,
+            query={"query": query},
+            preserve_order=False
+        ):
+            source = hit["_source"]
+            if isinstance(source.get("embedding"), str):
+                source["embedding"] = np.frombuffer(base64.b64decode(source["embedding"]), dtype=">f4").astype(np.float32).tolist()
+            yield ElasticSearchDocument(**source)
+
+    def delete_pdf_blocks(self, pdf_ids: Iterable[uuid.UUID], pages: Optional[Iterable[int]] = None) -> int:
+        filters = [{"terms": {"pdf_id": [str(pdf_id) for pdf_id in pdf_ids]}}]
+        if pages is not None:
+            filters.append({"terms": {"page_number": list(pages)}})
+
+        response = self.es.delete_by_query(
+            index=settings.INDEX_NAME,
+            query={"bool": {"filter": filters}},
+            conflicts="proceed",
+            refresh=True
+        )
+        return response.get("deleted", 0)
+
+    def iter_indexed_pdf_ids(self) -> Iterator[uuid.UUID]:
+        after_key = None
+
+        while True:
+            composite = {"size": 1000, "sources": [{"pdf_id": {"terms": {"field": "pdf_id"}}}]}
+            if after_key:
+                composite["after"] = after_key
+
+            response = self.es.search(index=settings.INDEX_NAME, size=0, aggs={"pdf_ids": {"composite": composite}})
+            aggregation = response.get("aggregations", {}).get("pdf_ids", {})
+
+            for bucket in aggregation.get("buckets", []):
+                yield uuid.UUID(bucket["key"]["pdf_id"])
+
+            after_key = aggregation.get("after_key")
+            if not after_key:
+                return
+
+    def iter_unowned_pdf_ids(self) -> Iterator[uuid.UUID]:
+        # PDFs indexed before blocks carried a user_id
+        after_key = None
+
+        while True:
+            composite = {"size": 1000, "sources": [{"pdf_id": {"terms": {"field": "pdf_id"}}}]}
+            if after_key:
+                composite["after"] = after_key
+
+            response = self.es.search(
+                index=settings.INDEX_NAME,
+                size=0,
+                query={"bool": {"must_not": [{"exists": {"field": "user_id"}}]}},
+                aggs={"pdf_ids": {"composite": composite}}
             )
+            aggregation = response.get("aggregations", {}).get("pdf_ids", {})
 
-            self.es.index(index=settings.INDEX_NAME, document=es_doc.dict())
+            for bucket in aggregation.get("buckets", []):
+                yield uuid.UUID(bucket["key"]["pdf_id"])
 
+            after_key = aggregation.get("after_key")
+            if not after_key:
+                return
 
-    def search(self, pdf_id: uuid.UUID, query_embedding: List[float], topk: int = 5) -> List[ElasticSearchResponse]:
-        query = None
-        if pdf_id:
-            query = {
-                "bool": {
-                    "filter": [
-                        {
-                            "term": {
-                                "pdf_id": str(pdf_id)
-                            }
-                        }
-                    ]
-                }
-            }
+    def source_has_embeddings(self, index_name: str) -> bool:
+        response = self.es.indices.get_mapping(index=index_name)
+        return not any(
+            "embedding" in index.get("mappings", {}).get("_source", {}).get("excludes", [])
+            for index in response.values()
+        )
+
+    def set_pdf_owner(self, pdf_id: uuid.UUID, user_id: uuid.UUID) -> int:
+        if self.source_has_embeddings(settings.INDEX_NAME):
+            response = self.es.update_by_query(
+                index=settings.INDEX_NAME,
+                query={"term": {"pdf_id": str(pdf_id)}},
+                script={"source": "ctx._source.user_id = params.user_id", "params": {"user_id": str(user_id)}},
+                conflicts="proceed",
+                refresh=True
+            )
+            return response.get("updated", 0)
+
+        # update_by_query rewrites each block from its _source, which has no vector here,
+        # so the blocks are re-embedded and indexed again before the unowned copies go
+        documents = [
+            document.model_copy(update={"user_id": user_id})
+            for document in self.iter_pdf_blocks(pdf_id)
+            if document.user_id is None
+        ]
+        if not documents:
+            return 0
+
+        embeddings = embedding_service.create_embeddings([document.content for document in documents])
+        for document, embedding in zip(documents, embeddings):
+            document.embedding = embedding.tolist()
+
+        result = self.index_document(documents)
+        if result.errors:
+            # The unowned blocks stay, the next compaction retries the whole PDF
+            raise RuntimeError(f"Error re-indexing {len(result.errors)} blocks of PDF {pdf_id}.")
+
+        self.es.delete_by_query(
+            index=settings.INDEX_NAME,
+            query={"bool": {
+                "filter": [{"term": {"pdf_id": str(pdf_id)}}],
+                "must_not": [{"exists": {"field": "user_id"}}]
+            }},
+            conflicts="proceed",
+            refresh=True
+        )
+        return result.indexed
 
+    def knn_clause(self, query_embedding: List[float], k: int, num_candidates: int, filters: List[dict], boost: Optional[float] = None) -> dict:
         knn = {
             "field": "embedding",
             "query_vector": query_embedding,
-            "k": topk,
-            "num_candidates": 50
+            "k": k,
+            "num_candidates": num_candidates
         }
+        # Filters inside the knn clause are applied during the ANN search, not after it
+        if filters:
+            knn["filter"] = filters
+        if boost is not None:
+            knn["boost"] = boost
+        return knn
 
-        response = self.es.search(
-            index=settings.INDEX_NAME,
-            query=query,
-            knn=knn,
-            size=topk,
-            source_excludes=["embedding"]
-        )
+    def text_clause(self, query_text: str, filters: List[dict], boost: Optional[float] = None) -> dict:
+        match = {"query": query_text}
+        if boost is not None:
+            match["boost"] = boost
+        return {
+            "bool": {
+                "must": [{"match": {"content": match}}],
+                "filter": filters
+            }
+        }
+
+    def result_options(self, query_text: Optional[str], pdf_id: Optional[uuid.UUID], highlight: bool, group_by: Optional[str], inner_hits: int) -> dict:
+        # Highlighting and grouping are computed by ES in the same request as the search
+        options = {}
+
+        highlight_options = None
+        if highlight and query_text:
+            highlight_options = {
+                "fields": {"content": {"fragment_size": 150, "number_of_fragments": 3}},
+                # kNN hits have no matched terms of their own, highlight the query text in them
+                "highlight_query": {"match": {"content": query_text}},
+            }
+            options["highlight"] = highlight_options
+
+        if group_by:
+            # Within one PDF the page number alone identifies a page
+            field = "pdf_id" if group_by == "pdf" else "page_number" if pdf_id else "page_key"
+            group_inner_hits = {"name": "group", "size": inner_hits, "_source": {"excludes": ["embedding"]}}
+            if highlight_options:
+                group_inner_hits["highlight"] = highlight_options
+            options["collapse"] = {"field": field, "inner_hits": group_inner_hits}
+
+        return options
+
+    async def search(
+        self,
+        user_id: uuid.UUID,
+        pdf_id: Optional[uuid.UUID],
+        query_embedding: List[float],
+        topk: int = 5,
+        query_text: Optional[str] = None,
+        mode: str = "knn",
+        fusion: str = "rrf",
+        k: Optional[int] = None,
+        num_candidates: Optional[int] = None,
+        knn_weight: float = 0.5,
+        highlight: bool = False,
+        group_by: Optional[GroupBy] = None,
+        inner_hits: int = 3
+    ) -> List[ElasticSearchResponse]:
+        # Every search is scoped to its owner, the filter is applied during the kNN search
+        filters = [{"term": {"user_id": str(user_id)}}]
+        if pdf_id:
+            filters.append({"term": {"pdf_id": str(pdf_id)}})
+        routing = str(user_id) if settings.ES_ROUTE_BY_USER else None
+        # Grouped results need enough nearest blocks to fill topk groups
+        k = max(k or topk, topk * inner_hits if group_by else topk)
+        num_candidates = max(num_candidates or settings.SEARCH_NUM_CANDIDATES, k)
+        options = self.result_options(query_text, pdf_id, highlight, group_by, inner_hits)
 
-        hits = response.get("hits", {}).get("hits", [])
-        return [
-            ElasticSearchResponse(
-                pdf_id=pdf_id,
-                type=hit["_source"].get("type"),
-                page_number=hit["_source"].get("page_number"),
-                block_index=hit["_source"].get("block_index"),
-                content=hit["_source"].get("content"),
+        if mode == "knn" or not query_text:
+            response = await self.async_es.search(
+                index=settings.INDEX_NAME,
+                knn=self.knn_clause(query_embedding, k, num_candidates, filters),
+                size=topk,
+                source_excludes=["embedding"],
+                routing=routing,
+                **options
             )
-            for hit in hits
-        ]
+            hits = response.get("hits", {}).get("hits", [])
+
+        elif fusion == "weighted":
+            # Both clauses in one request, ES sums the boosted BM25 and vector scores
+            response = await self.async_es.search(
+                index=settings.INDEX_NAME,
+                query=self.text_clause(query_text, filters, boost=1 - knn_weight),
+                knn=self.knn_clause(query_embedding, k, num_candidates, filters, boost=knn_weight),
+                size=topk,
+                source_excludes=["embedding"],
+                routing=routing,
+                **options
+            )
+            hits = response.get("hits", {}).get("hits", [])
+
+        else:
+            # BM25 and kNN ranked lists fetched in a single _msearch round-trip, fused with RRF
+            header = {"index": settings.INDEX_NAME, **({"routing": routing} if routing else {})}
+            response = await self.async_es.msearch(searches=[
+                header,
+                {"query": self.text_clause(query_text, filters), "size": k, "_source": {"excludes": ["embedding"]}, **options},
+                header,
+                {"knn": self.knn_clause(query_embedding, k, num_candidates, filters), "size": k, "_source": {"excludes": ["embedding"]}, **options},
+            ])
+
+            ranked_lists = []
+            for item in response.get("responses", []):
+                if "error" in item:
+                    raise RuntimeError(f"Search failed: {item['error']}")
+                ranked_lists.append(item.get("hits", {}).get("hits", []))
+
+            # Grouped lists are fused per group, each list holds one hit per group
+            hits = reciprocal_rank_fusion(ranked_lists, topk, key=group_key(group_by))
+
+        return hits_to_responses(hits)
+
+    async def ping(self) -> bool:
+        # Readiness probes must answer quickly, so no retries and a short timeout
+        return await self.async_es.options(
+            request_timeout=settings.HEALTH_CHECK_TIMEOUT,
+            max_retries=0
+        ).ping()
 
-search_service = ElasticSearchService()
+    async def close(self):
+        await self.async_es.close()
+        self.es.close()
@@ -1,12 +1,113 @@
 from sentence_transformers import SentenceTransformer
-from typing import List
+from app.config.config import settings
+from app.services.cache import EmbeddingCache, LRUCache
+from typing import List, Optional
+import numpy as np
+import threading
+import time
+import torch
 
 class EmbeddingService:
-    def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2"):
-        self.model = SentenceTransformer(model_name)
+    def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2", backend: str = "torch"):
+        self.model_name = model_name
+        self.backend = backend
+        self._model: Optional[SentenceTransformer] = None
+        self.model_lock = threading.Lock()
+        self.cache = EmbeddingCache(
+            model_name,
+            memory_size=settings.EMBEDDING_CACHE_SIZE,
+            disk_path=settings.EMBEDDING_CACHE_PATH or None,
+            disk_size=settings.EMBEDDING_CACHE_DISK_SIZE
+        )
+        self.query_cache = LRUCache(settings.QUERY_CACHE_SIZE, ttl=settings.QUERY_CACHE_TTL, name="query")
+
+    @property
+    def model(self) -> SentenceTransformer:
+        if self._model is None:
+            with self.model_lock:
+                if self._model is None:
+                    self._model = self.load_model()
+        return self._model
+
+    def load_model(self) -> SentenceTransformer:
+        if self.backend == "onnx":
+            model_kwargs = {"file_name": settings.EMBEDDING_ONNX_FILE} if settings.EMBEDDING_ONNX_FILE else None
+            return SentenceTransformer(self.model_name, backend="onnx", model_kwargs=model_kwargs)
+
+        model = SentenceTransformer(self.model_name, device="cpu" if self.backend == "torch-int8" else None)
+
+        if self.backend == "torch-int8":
+            # Dynamic int8 quantization of the Linear layers, the bulk of MiniLM's CPU time
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+        return model
+
+    def warm_up(self):
+        start = time.perf_counter()
+        self.model.encode(["warm up"] * 2, batch_size=2, convert_to_numpy=True, show_progress_bar=False)
+        print(f"Embedding model {self.model_name} ({self.backend}) ready in {time.perf_counter() - start:.2f}s.")
 
     def create_embedding(self, text: str) -> List[float]:
         embedding = self.model.encode(text, convert_to_numpy=True)
         return embedding.tolist()
 
-embedding_service = EmbeddingService()
\ No newline at end of file
+    def create_query_embedding(self, query: str) -> List[float]:
+        key = " ".join(query.split())
+        embedding = self.query_cache.get(key)
+
+        if embedding is None:
+            embedding = self.create_embedding(key)
+            self.query_cache.put(key, embedding)
+
+        return embedding
+
+    def encode_batches(self, texts: List[str], batch_size: int) -> np.ndarray:
+        dims = self.model.get_sentence_embedding_dimension()
+        embeddings = np.empty((len(texts), dims), dtype=np.float32)
+
+        # Sort by length so every batch holds texts of similar size and pads little
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+
+        for start in range(0, len(order), batch_size):
+            batch_ids = order[start:start + batch_size]
+            batch = self.model.encode(
+                [texts[i] for i in batch_ids],
+                batch_size=batch_size,
+                convert_to_numpy=True,
+                show_progress_bar=False
+            )
+            embeddings[batch_ids] = batch.astype(np.float32, copy=False)
+
+        return embeddings
+
+    def create_embeddings(self, texts: List[str], batch_size: Optional[int] = None) -> np.ndarray:
+        batch_size = batch_size or settings.EMBEDDING_BATCH_SIZE
+        dims = self.model.get_sentence_embedding_dimension()
+        embeddings = np.empty((len(texts), dims), dtype=np.float32)
+
+        if not texts:
+            return embeddings
+
+        keys = [self.cache.key(text) for text in texts]
+        cached = self.cache.get_many(set(keys))
+
+        # Identical blocks inside one upload are only encoded once
+        missing = {}
+        for idx, key in enumerate(keys):
+            if key in cached:
+                embeddings[idx] = cached[key]
+            else:
+                missing.setdefault(key, []).append(idx)
+
+        if missing:
+            missing_keys = list(missing)
+            encoded = self.encode_batches([texts[missing[key][0]] for key in missing_keys], batch_size)
+
+            for key, vector in zip(missing_keys, encoded):
+                embeddings[missing[key]] = vector
+
+            self.cache.put_many(dict(zip(missing_keys, encoded)))
+
+        return embeddings
+
+embedding_service = EmbeddingService(settings.EMBEDDING_MODEL, backend=settings.EMBEDDING_BACKEND)
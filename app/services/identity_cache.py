@@ -0,0 +1,45 @@
+from app.config.config import settings
+from app.services.cache import LRUCache
+from app.schemas.user_schema import User as UserSchema
+from app.models import PdfDocument, User
+from sqlalchemy import exists, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import FrozenSet, Optional
+import uuid
+
+# Short-lived caches for the authenticated hot path, entries are dropped on writes in this
+# process and expire after AUTH_CACHE_TTL so writes made by other processes show up too
+user_cache = LRUCache(settings.AUTH_CACHE_SIZE, ttl=settings.AUTH_CACHE_TTL, name="user")
+pdf_ownership_cache = LRUCache(settings.AUTH_CACHE_SIZE, ttl=settings.AUTH_CACHE_TTL, name="pdf_ownership")
+
+async def get_cached_user(email: str, db: AsyncSession) -> Optional[UserSchema]:
+    user = user_cache.get(email)
+    if user is not None:
+        return user
+
+    result = await db.execute(select(User).filter(User.email == email).limit(1))
+    db_user = result.scalars().first()
+    if db_user is None:
+        return None
+
+    user = UserSchema.model_validate(db_user)
+    user_cache.put(email, user)
+    return user
+
+async def user_owns_pdf(user_id: uuid.UUID, pdf_id: uuid.UUID, db: AsyncSession) -> bool:
+    # The cached set only holds PDFs confirmed by earlier checks, not the user's whole library
+    pdf_ids: FrozenSet[uuid.UUID] = pdf_ownership_cache.get(user_id) or frozenset()
+    if pdf_id in pdf_ids:
+        return True
+
+    # A single-row lookup on the primary key, unknown ids aren't cached since the PDF may be created later
+    owned = await db.scalar(select(exists().where(PdfDocument.id == pdf_id, PdfDocument.user_id == user_id)))
+    if owned:
+        pdf_ownership_cache.put(user_id, pdf_ids | {pdf_id})
+    return bool(owned)
+
+def invalidate_user(email: str):
+    user_cache.invalidate(email)
+
+def invalidate_user_pdfs(user_id: uuid.UUID):
+    pdf_ownership_cache.invalidate(user_id)
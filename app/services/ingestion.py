@@ -0,0 +1,269 @@
+from app.config.config import settings
+from app.db import database
+from app.schemas.pdf_schema import PdfDocumentCreate
+from app.services.job import claim_batch_jobs, get_job, update_job
+from app.services.cache import CacheStats
+from app.services.pdf import create_pdf_document, delete_page_hashes, get_page_hashes, get_pdf_document, get_pdf_document_by_hash, save_page_hashes, update_pdf_document
+from app.services.pdf_extractor import compute_page_hashes, get_page_count
+from app.services.search import search_service
+from app.services.pipeline import PageProgress, reuse_pdf_blocks, run_batch_pipeline, run_ingestion_pipeline
+from app.utils.metrics import stage_duration_seconds
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional
+import datetime
+import os
+import time
+import uuid
+
+# Progress when each stage is done, the ingest stage moves towards its share as pages are indexed
+STAGE_PROGRESS = {
+    "ingest": 0.9,
+    "store": 1.0,
+}
+
+document_dedup_stats = CacheStats("document")
+
+def job_duration(job) -> Optional[float]:
+    return round((datetime.datetime.now() - job.started_at).total_seconds(), 4) if job.started_at else None
+
+@contextmanager
+def job_stage(job_id: uuid.UUID, name: str, timings: Dict[str, float], db):
+    start = time.perf_counter()
+    yield
+    timings[name] = round(time.perf_counter() - start, 4)
+    stage_duration_seconds.labels(stage=name).observe(timings[name])
+    update_job(job_id, db, progress=STAGE_PROGRESS[name], stage_timings=dict(timings))
+
+def document_status(failed_pages: Dict[int, str]) -> str:
+    # Searchable, but some pages are missing until they're reprocessed
+    return "partial" if failed_pages else "ready"
+
+def record_failed_pages(job, failed_pages: Dict[int, str], db):
+    if failed_pages:
+        print(f"Ingestion job {job.id}: {len(failed_pages)} pages failed extraction.")
+        update_job(job.id, db, failed_pages={str(page_num): error for page_num, error in failed_pages.items()})
+
+def indexed_page_hashes(page_hashes: Dict[int, str], failed_pages: Dict[int, str]) -> Dict[int, str]:
+    return {page_num: page_hash for page_num, page_hash in page_hashes.items() if page_num not in failed_pages}
+
+def job_progress(job_id: uuid.UUID, pages: Iterable[int]) -> PageProgress:
+    # Reported from the indexing thread, so it writes through a session of its own
+    def report(done: float):
+        db = database.SessionLocal()
+        try:
+            update_job(job_id, db, progress=round(STAGE_PROGRESS["ingest"] * done, 3))
+        finally:
+            db.close()
+
+    return PageProgress(pages, report)
+
+def ingest_pdf(job, timings: Dict[str, float], db):
+    source_pdf = get_pdf_document_by_hash(job.content_hash, db) if job.content_hash else None
+    document_dedup_stats.record(hits=int(source_pdf is not None), misses=int(source_pdf is None))
+
+    with job_stage(job.id, "ingest", timings, db):
+        if source_pdf is not None:
+            # Identical file was ingested before, copy its blocks and vectors instead of recomputing them
+            page_hashes = get_page_hashes(source_pdf.id, db)
+            pipeline_result = reuse_pdf_blocks(source_pdf.id, job.pdf_id, job.user_id)
+        else:
+            page_hashes = compute_page_hashes(job.file_path)
+            pipeline_result = run_ingestion_pipeline(
+                job.pdf_id, job.user_id, job.file_path,
+                progress=job_progress(job.id, page_hashes)
+            )
+        timings.update(pipeline_result.stage_timings)
+
+        if pipeline_result.index_errors:
+            raise RuntimeError(f"Error indexing {len(pipeline_result.index_errors)} PDF blocks.")
+
+    with job_stage(job.id, "store", timings, db):
+        create_pdf_document(PdfDocumentCreate(
+            id=job.pdf_id,
+            user_id=job.user_id,
+            file_name=job.file_name,
+            content_hash=job.content_hash,
+            status=document_status(pipeline_result.failed_pages),
+            page_count=len(page_hashes),
+            block_count=pipeline_result.block_count,
+            ingest_duration=job_duration(job),
+        ), db)
+        save_page_hashes(job.pdf_id, indexed_page_hashes(page_hashes, pipeline_result.failed_pages), db)
+        record_failed_pages(job, pipeline_result.failed_pages, db)
+
+def reprocess_pdf(job, timings: Dict[str, float], db):
+    update_pdf_document(job.pdf_id, db, status="processing")
+    pdf_doc = get_pdf_document(job.pdf_id, db)
+
+    with job_stage(job.id, "ingest", timings, db):
+        page_hashes = compute_page_hashes(job.file_path)
+        previous_hashes = get_page_hashes(job.pdf_id, db)
+
+        # Only pages whose fingerprint changed are deleted and re-embedded
+        changed_pages = [page_num for page_num, page_hash in page_hashes.items() if previous_hashes.get(page_num) != page_hash]
+        removed_pages = [page_num for page_num in previous_hashes if page_num not in page_hashes]
+
+        deleted = 0
+        if not previous_hashes:
+            search_service.delete_pdf_blocks([job.pdf_id])
+        elif changed_pages or removed_pages:
+            # Hashes go first, if the job fails after this these pages are re-extracted next time
+            delete_page_hashes(job.pdf_id, changed_pages + removed_pages, db)
+            deleted = search_service.delete_pdf_blocks([job.pdf_id], changed_pages + removed_pages)
+
+        print(f"Reprocessing PDF {job.pdf_id}: {len(changed_pages)} changed, {len(removed_pages)} removed of {len(page_hashes)} pages.")
+
+        pipeline_result = run_ingestion_pipeline(
+            job.pdf_id, job.user_id, job.file_path,
+            pages=changed_pages,
+            progress=job_progress(job.id, changed_pages)
+        )
+        timings.update(pipeline_result.stage_timings)
+
+        if pipeline_result.index_errors:
+            raise RuntimeError(f"Error indexing {len(pipeline_result.index_errors)} PDF blocks.")
+
+    # Documents stored before block counts were tracked stay without one until fully re-ingested
+    if not previous_hashes:
+        block_count = pipeline_result.block_count
+    elif pdf_doc.block_count is not None:
+        block_count = pdf_doc.block_count - deleted + pipeline_result.block_count
+    else:
+        block_count = None
+
+    with job_stage(job.id, "store", timings, db):
+        update_pdf_document(
+            job.pdf_id, db,
+            file_name=job.file_name,
+            content_hash=job.content_hash,
+            status=document_status(pipeline_result.failed_pages),
+            page_count=len(page_hashes),
+            block_count=block_count,
+            ingest_duration=job_duration(job),
+        )
+        # Pages that failed extraction keep no hash, so the next reprocess retries them
+        save_page_hashes(job.pdf_id, indexed_page_hashes(page_hashes, pipeline_result.failed_pages), db)
+        record_failed_pages(job, pipeline_result.failed_pages, db)
+
+def fail_job(job, error: Exception, timings: Dict[str, float], db):
+    print(f"Error processing ingestion job {job.id}: {error}")
+    db.rollback()
+    update_job(job.id, db, status="failed", error=str(error), stage_timings=dict(timings), finished_at=datetime.datetime.now())
+
+    if job.kind == "reprocess":
+        update_pdf_document(job.pdf_id, db, status="failed")
+    else:
+        # Blocks the pipeline indexed before the failure would show up in the user's searches
+        # under a PDF they can't list or delete, and the upload is removed so it can't be retried
+        try:
+            search_service.delete_pdf_blocks([job.pdf_id])
+        except Exception as e:
+            print(f"Error deleting blocks of failed ingestion job {job.id}: {e}")
+
+        # A failure after the document was stored leaves it without blocks
+        update_pdf_document(job.pdf_id, db, status="failed")
+
+def remove_upload(job):
+    if os.path.exists(job.file_path):
+        os.remove(job.file_path)
+
+def run_job(job, handler: Callable, db):
+    timings: Dict[str, float] = {}
+
+    try:
+        handler(job, timings, db)
+        update_job(job.id, db, status="completed", finished_at=datetime.datetime.now())
+
+    except Exception as e:
+        fail_job(job, e, timings, db)
+
+    finally:
+        remove_upload(job)
+
+def batch_job_progress(job) -> Optional[PageProgress]:
+    try:
+        return job_progress(job.id, range(get_page_count(job.file_path)))
+    except Exception:
+        # Files that can't be opened are skipped by the pipeline and fail when stored
+        return None
+
+def ingest_pdf_batch(jobs: List, db):
+    # Files ingested before are copied as usual, the rest share one pipeline
+    pipeline_jobs = []
+    for job in jobs:
+        if job.content_hash and get_pdf_document_by_hash(job.content_hash, db) is not None:
+            run_job(job, ingest_pdf, db)
+        else:
+            pipeline_jobs.append(job)
+
+    if not pipeline_jobs:
+        return
+
+    document_dedup_stats.record(misses=len(pipeline_jobs))
+    timings: Dict[str, float] = {}
+
+    try:
+        start = time.perf_counter()
+        # A batch interrupted by a crash is ingested again from scratch, drop what it had indexed so far
+        search_service.delete_pdf_blocks([job.pdf_id for job in pipeline_jobs])
+        results = run_batch_pipeline(
+            [(job.pdf_id, job.user_id, job.file_path) for job in pipeline_jobs],
+            progress=[batch_job_progress(job) for job in pipeline_jobs]
+        )
+        timings["ingest"] = round(time.perf_counter() - start, 4)
+        stage_duration_seconds.labels(stage="ingest").observe(timings["ingest"])
+
+    except Exception as e:
+        for job in pipeline_jobs:
+            fail_job(job, e, timings, db)
+            remove_upload(job)
+        return
+
+    for job, result in zip(pipeline_jobs, results):
+        job_timings = {**result.stage_timings, **timings}
+
+        try:
+            if result.index_errors:
+                raise RuntimeError(f"Error indexing {len(result.index_errors)} PDF blocks.")
+
+            with job_stage(job.id, "store", job_timings, db):
+                page_hashes = compute_page_hashes(job.file_path)
+                create_pdf_document(PdfDocumentCreate(
+                    id=job.pdf_id,
+                    user_id=job.user_id,
+                    file_name=job.file_name,
+                    content_hash=job.content_hash,
+                    status=document_status(result.failed_pages),
+                    page_count=len(page_hashes),
+                    block_count=result.block_count,
+                    ingest_duration=job_duration(job),
+                ), db)
+                save_page_hashes(job.pdf_id, indexed_page_hashes(page_hashes, result.failed_pages), db)
+                record_failed_pages(job, result.failed_pages, db)
+
+            update_job(job.id, db, status="completed", finished_at=datetime.datetime.now())
+
+        except Exception as e:
+            fail_job(job, e, job_timings, db)
+
+        finally:
+            remove_upload(job)
+
+def process_ingestion_job(job_id: uuid.UUID):
+    db = database.SessionLocal()
+
+    try:
+        job = get_job(job_id, db)
+
+        if job is None:
+            return
+
+        if job.batch_id is not None and job.kind == "ingest":
+            ingest_pdf_batch([job, *claim_batch_jobs(job.batch_id, db, settings.BATCH_FILES_PER_RUN - 1)], db)
+        elif job.kind == "reprocess":
+            run_job(job, reprocess_pdf, db)
+        else:
+            run_job(job, ingest_pdf, db)
+
+    finally:
+        db.close()
@@ -0,0 +1,91 @@
+from app.schemas.job_schema import IngestionBatch, IngestionJob as IngestionJobSchema, IngestionJobCreate
+from app.db.database import get_db
+from sqlalchemy.orm import Session
+from fastapi import Depends
+from collections import Counter
+from typing import Dict, List, Optional, Set
+import datetime
+import uuid
+from app.models import IngestionJob
+
+def create_job(job: IngestionJobCreate, db: Session = Depends(get_db)):
+    db_job = IngestionJob(**job.dict(), status="queued", progress=0.0, stage_timings={}, created_at=datetime.datetime.now())
+
+    db.add(db_job)
+    db.commit()
+    db.refresh(db_job)
+    return db_job
+
+def get_job(job_id: uuid.UUID, db: Session = Depends(get_db)):
+    return db.query(IngestionJob).filter(IngestionJob.id == job_id).first()
+
+def update_job(job_id: uuid.UUID, db: Session, **fields):
+    db.query(IngestionJob).filter(IngestionJob.id == job_id).update(fields, synchronize_session=False)
+    db.commit()
+
+def claim_job(job_id: uuid.UUID, db: Session) -> bool:
+    # Conditional update so that only one worker can move a job out of "queued"
+    claimed = db.query(IngestionJob).filter(
+        IngestionJob.id == job_id,
+        IngestionJob.status == "queued"
+    ).update({"status": "running", "started_at": datetime.datetime.now()}, synchronize_session=False)
+    db.commit()
+    return claimed == 1
+
+def claim_batch_jobs(batch_id: uuid.UUID, db: Session, limit: int) -> List[IngestionJob]:
+    # Queued files of the same batch are ingested together by whichever worker claims one of them
+    candidates = db.query(IngestionJob.id).filter(
+        IngestionJob.batch_id == batch_id,
+        IngestionJob.status == "queued"
+    ).order_by(IngestionJob.created_at).limit(limit).all()
+
+    claimed = [job_id for (job_id,) in candidates if claim_job(job_id, db)]
+    return db.query(IngestionJob).filter(IngestionJob.id.in_(claimed)).all() if claimed else []
+
+def requeue_batch_jobs(batch_id: uuid.UUID, db: Session):
+    # Used when resuming a batch whose ingestion process died, its "running" jobs will never finish
+    db.query(IngestionJob).filter(
+        IngestionJob.batch_id == batch_id,
+        IngestionJob.status == "running"
+    ).update({"status": "queued", "progress": 0.0}, synchronize_session=False)
+    db.commit()
+
+def get_batch_jobs(batch_id: uuid.UUID, db: Session) -> List[IngestionJob]:
+    return db.query(IngestionJob).filter(IngestionJob.batch_id == batch_id).order_by(IngestionJob.created_at).all()
+
+def summarize_batch(batch_id: uuid.UUID, jobs: List[IngestionJob], rejected: Optional[Dict[str, str]] = None) -> IngestionBatch:
+    return IngestionBatch(
+        id=batch_id,
+        total=len(jobs),
+        status_counts=Counter(job.status for job in jobs),
+        jobs=[IngestionJobSchema.model_validate(job) for job in jobs],
+        rejected=rejected or {},
+    )
+
+def claim_next_job(db: Session, batch_size: int = 5) -> Optional[uuid.UUID]:
+    candidates = db.query(IngestionJob.id).filter(
+        IngestionJob.status == "queued"
+    ).order_by(IngestionJob.created_at).limit(batch_size).all()
+
+    for (job_id,) in candidates:
+        if claim_job(job_id, db):
+            return job_id
+
+    return None
+
+def requeue_stale_jobs(db: Session, stale_after: int):
+    # Jobs left "running" by a worker that died are put back in the queue
+    cutoff = datetime.datetime.now() - datetime.timedelta(seconds=stale_after)
+    db.query(IngestionJob).filter(
+        IngestionJob.status == "running",
+        IngestionJob.started_at < cutoff
+    ).update({"status": "queued", "progress": 0.0}, synchronize_session=False)
+    db.commit()
+
+def get_pending_job_ids(db: Session) -> List[uuid.UUID]:
+    rows = db.query(IngestionJob.id).filter(IngestionJob.status == "queued").order_by(IngestionJob.created_at).all()
+    return [job_id for (job_id,) in rows]
+
+def get_active_pdf_ids(db: Session) -> Set[uuid.UUID]:
+    rows = db.query(IngestionJob.pdf_id).filter(IngestionJob.status.in_(["queued", "running"])).all()
+    return {pdf_id for (pdf_id,) in rows}
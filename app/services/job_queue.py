@@ -0,0 +1,125 @@
+from abc import ABC, abstractmethod
+from app.config.config import settings
+from app.db import database
+from app.services.job import claim_job, claim_next_job, get_pending_job_ids, requeue_stale_jobs
+from app.services.ingestion import process_ingestion_job
+from typing import Callable, List, Optional
+import queue
+import threading
+import uuid
+
+class JobQueue(ABC):
+    def __init__(self, handler: Callable[[uuid.UUID], None], workers: int):
+        self.handler = handler
+        self.workers = workers
+        self.threads: List[threading.Thread] = []
+        self.stop_event = threading.Event()
+
+    @abstractmethod
+    def enqueue(self, job_id: uuid.UUID):
+        ...
+
+    @abstractmethod
+    def next_job(self, timeout: float) -> Optional[uuid.UUID]:
+        ...
+
+    def start(self):
+        db = database.SessionLocal()
+        try:
+            requeue_stale_jobs(db, settings.JOB_STALE_AFTER)
+        finally:
+            db.close()
+
+        self.stop_event.clear()
+
+        for i in range(self.workers):
+            thread = threading.Thread(target=self.run_worker, name=f"ingestion-worker-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+        print(f"Started {self.workers} ingestion workers ({settings.JOB_QUEUE_BACKEND} queue).")
+
+    def stop(self, timeout: Optional[float] = None):
+        self.stop_event.set()
+
+        for thread in self.threads:
+            thread.join(timeout)
+
+        self.threads = []
+
+    def run_worker(self):
+        while not self.stop_event.is_set():
+            try:
+                job_id = self.next_job(timeout=settings.JOB_POLL_INTERVAL)
+            except Exception as e:
+                print(f"Error fetching next ingestion job: {e}")
+                self.stop_event.wait(settings.JOB_POLL_INTERVAL)
+                continue
+
+            if job_id is None:
+                continue
+
+            try:
+                self.handler(job_id)
+            except Exception as e:
+                print(f"Unhandled error in ingestion job {job_id}: {e}")
+
+class InProcessJobQueue(JobQueue):
+    def __init__(self, handler: Callable[[uuid.UUID], None], workers: int):
+        super().__init__(handler, workers)
+        self.queue: "queue.Queue[uuid.UUID]" = queue.Queue()
+
+    def start(self):
+        super().start()
+
+        db = database.SessionLocal()
+        try:
+            for job_id in get_pending_job_ids(db):
+                self.enqueue(job_id)
+        finally:
+            db.close()
+
+    def enqueue(self, job_id: uuid.UUID):
+        self.queue.put(job_id)
+
+    def next_job(self, timeout: float) -> Optional[uuid.UUID]:
+        try:
+            job_id = self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+        db = database.SessionLocal()
+        try:
+            return job_id if claim_job(job_id, db) else None
+        finally:
+            db.close()
+
+class DatabaseJobQueue(JobQueue):
+    def enqueue(self, job_id: uuid.UUID):
+        # The job row itself is the queue entry, workers pick it up by polling
+        pass
+
+    def next_job(self, timeout: float) -> Optional[uuid.UUID]:
+        db = database.SessionLocal()
+        try:
+            job_id = claim_next_job(db)
+        finally:
+            db.close()
+
+        if job_id is None:
+            self.stop_event.wait(timeout)
+
+        return job_id
+
+JOB_QUEUE_BACKENDS = {
+    "memory": InProcessJobQueue,
+    "database": DatabaseJobQueue,
+}
+
+def create_job_queue(backend: str, handler: Callable[[uuid.UUID], None], workers: int) -> JobQueue:
+    if backend not in JOB_QUEUE_BACKENDS:
+        raise ValueError(f"Unknown job queue backend: {backend}")
+
+    return JOB_QUEUE_BACKENDS[backend](handler, workers)
+
+job_queue = create_job_queue(settings.JOB_QUEUE_BACKEND, process_ingestion_job, settings.JOB_WORKERS)
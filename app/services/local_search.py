@@ -0,0 +1,455 @@
+from app.config.config import settings
+from app.services.search_backend import (
+    BulkIndexResult,
+    ElasticSearchDocument,
+    ElasticSearchResponse,
+    GroupBy,
+    SearchBackend,
+    collapse_hits,
+    highlight_fragments,
+    hits_to_responses,
+    reciprocal_rank_fusion,
+)
+from collections import Counter, defaultdict
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+import asyncio
+import json
+import math
+import os
+import re
+import threading
+import uuid
+
+TOKEN_PATTERN = re.compile(r"\w+")
+BLOCK_FIELDS = ["pdf_id", "user_id", "type", "page_number", "block_index", "block_end_index", "chunk_index", "content", "error"]
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+class Bm25Index:
+    def __init__(self, contents: List[str], k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.size = len(contents)
+        self.postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+        lengths = np.zeros(self.size, dtype=np.float32)
+        postings: Dict[str, Tuple[List[int], List[int]]] = defaultdict(lambda: ([], []))
+        for row, content in enumerate(contents):
+            terms = Counter(tokenize(content))
+            lengths[row] = sum(terms.values())
+            for term, tf in terms.items():
+                postings[term][0].append(row)
+                postings[term][1].append(tf)
+
+        self.lengths = lengths
+        self.avg_length = float(lengths.mean()) if self.size else 0.0
+        for term, (rows, tfs) in postings.items():
+            self.postings[term] = (np.asarray(rows, dtype=np.int64), np.asarray(tfs, dtype=np.float32))
+
+    def scores(self, query: str) -> np.ndarray:
+        scores = np.zeros(self.size, dtype=np.float32)
+        if not self.size:
+            return scores
+
+        norm = self.k1 * (1 - self.b + self.b * self.lengths / max(self.avg_length, 1e-6))
+        for term in set(tokenize(query)):
+            if term not in self.postings:
+                continue
+            rows, tfs = self.postings[term]
+            idf = math.log(1 + (self.size - len(rows) + 0.5) / (len(rows) + 0.5))
+            scores[rows] += idf * tfs * (self.k1 + 1) / (tfs + norm[rows])
+
+        return scores
+
+class IvfIndex:
+    # Inverted-file index: vectors are bucketed by their nearest centroid and a query only
+    # scores the buckets of its nprobe nearest centroids
+    def __init__(self, vectors: np.ndarray, nlist: int, iterations: int = 10, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        sample = vectors[rng.choice(len(vectors), size=min(len(vectors), nlist * 64), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            for cluster in range(nlist):
+                members = sample[assignment == cluster]
+                if len(members):
+                    centroid = members.mean(axis=0)
+                    centroids[cluster] = centroid / max(np.linalg.norm(centroid), 1e-12)
+
+        self.centroids = centroids
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        self.lists = [np.flatnonzero(assignment == cluster) for cluster in range(nlist)]
+
+    def candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        nearest = np.argsort(-(self.centroids @ query))[:nprobe]
+        return np.concatenate([self.lists[cluster] for cluster in nearest])
+
+class Segment:
+    # Immutable pair of files: the vectors of a run of blocks and the blocks themselves
+    def __init__(self, directory: str, name: str):
+        self.name = name
+        # Vectors stay on disk and are paged in by the OS as searches touch them
+        self.vectors = np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+        with open(os.path.join(directory, f"{name}.jsonl"), "r", encoding="utf-8") as f:
+            self.blocks = [json.loads(line) for line in f]
+
+    def __len__(self) -> int:
+        return len(self.blocks)
+
+    @staticmethod
+    def write(directory: str, name: str, vectors: np.ndarray, blocks: List[dict]) -> "Segment":
+        path = os.path.join(directory, name)
+        with open(path + ".npy.tmp", "wb") as f:
+            np.save(f, np.ascontiguousarray(vectors, dtype=np.float32))
+        with open(path + ".jsonl.tmp", "w", encoding="utf-8") as f:
+            for block in blocks:
+                f.write(json.dumps(block) + "\n")
+
+        os.replace(path + ".npy.tmp", path + ".npy")
+        os.replace(path + ".jsonl.tmp", path + ".jsonl")
+        return Segment(directory, name)
+
+class TenantIndex:
+    # Appends write a new segment instead of rewriting the tenant. The manifest lists the live
+    # segments and is replaced atomically, so a crash never leaves a half-written tenant behind
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.RLock()
+        self.segments: List[Segment] = []
+        self.next_segment = 0
+        self.blocks: List[dict] = []
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.pdf_ids = np.empty(0, dtype=object)
+        self.bm25: Optional[Bm25Index] = None
+        self.ivf: Optional[IvfIndex] = None
+        self.load()
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.path, "segments.json")
+
+    def load(self):
+        if not os.path.exists(self.manifest_path):
+            self.migrate()
+            if not os.path.exists(self.manifest_path):
+                return
+
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+
+        self.next_segment = manifest["next"]
+        self.segments = [Segment(self.path, name) for name in manifest["segments"]]
+        self.reset_derived()
+
+    def migrate(self):
+        # Tenants written before segments were a single vectors.npy and blocks.jsonl
+        vectors_path = os.path.join(self.path, "vectors.npy")
+        if not os.path.exists(vectors_path):
+            return
+
+        os.replace(vectors_path, os.path.join(self.path, "segment-000000.npy"))
+        os.replace(os.path.join(self.path, "blocks.jsonl"), os.path.join(self.path, "segment-000000.jsonl"))
+        self.next_segment = 1
+        self.write_manifest(["segment-000000"])
+
+    def write_manifest(self, names: List[str]):
+        with open(self.manifest_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"segments": names, "next": self.next_segment}, f)
+        os.replace(self.manifest_path + ".tmp", self.manifest_path)
+
+    def reset_derived(self):
+        self.blocks = [block for segment in self.segments for block in segment.blocks]
+        self.offsets = np.cumsum([0] + [len(segment) for segment in self.segments], dtype=np.int64)
+        self.pdf_ids = np.asarray([block["pdf_id"] for block in self.blocks], dtype=object)
+        self.bm25 = None
+        self.ivf = None
+
+    def new_segment(self, vectors: np.ndarray, blocks: List[dict]) -> Segment:
+        os.makedirs(self.path, exist_ok=True)
+        name = f"segment-{self.next_segment:06d}"
+        self.next_segment += 1
+        return Segment.write(self.path, name, vectors, blocks)
+
+    def merge(self, segments: List[Segment]) -> Segment:
+        return self.new_segment(
+            np.concatenate([np.asarray(segment.vectors) for segment in segments]),
+            [block for segment in segments for block in segment.blocks]
+        )
+
+    def commit(self, segments: List[Segment]):
+        self.write_manifest([segment.name for segment in segments])
+
+        # Files of replaced segments stay mapped by readers that still hold them
+        live = {segment.name for segment in segments}
+        for file_name in os.listdir(self.path):
+            if file_name.startswith("segment-") and file_name.split(".")[0] not in live:
+                os.remove(os.path.join(self.path, file_name))
+
+        self.segments = segments
+        self.reset_derived()
+
+    def append(self, vectors: np.ndarray, blocks: List[dict]):
+        with self.lock:
+            segments = self.segments + [self.new_segment(vectors, blocks)]
+
+            # Tiered merging: a segment is merged into the one before it once it's as large,
+            # which keeps a logarithmic number of segments and rewrites each block log(n) times
+            while len(segments) >= 2 and len(segments[-1]) >= len(segments[-2]):
+                segments = segments[:-2] + [self.merge(segments[-2:])]
+
+            self.commit(segments)
+
+    def merge_all(self) -> int:
+        with self.lock:
+            if len(self.segments) <= 1:
+                return 0
+            merged = len(self.segments)
+            self.commit([self.merge(self.segments)])
+            return merged
+
+    def delete(self, should_delete: Callable[[dict], bool]) -> int:
+        # The mask is built under the lock, a concurrent append or merge can't shift it
+        with self.lock:
+            keep = np.asarray([not should_delete(block) for block in self.blocks], dtype=bool)
+            deleted = int(len(keep) - keep.sum())
+            if not deleted:
+                return 0
+
+            # Only the segments that lose blocks are rewritten
+            segments = []
+            for segment, start in zip(self.segments, self.offsets):
+                segment_keep = keep[start:start + len(segment)]
+                if segment_keep.all():
+                    segments.append(segment)
+                elif segment_keep.any():
+                    segments.append(self.new_segment(
+                        np.asarray(segment.vectors)[segment_keep],
+                        [block for block, kept in zip(segment.blocks, segment_keep) if kept]
+                    ))
+
+            self.commit(segments)
+            return deleted
+
+    def dot(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        # Each segment's memmap is multiplied directly, only a subset of rows is gathered
+        if rows is None:
+            if not self.segments:
+                return np.empty(0, dtype=np.float32)
+            return np.concatenate([segment.vectors @ query for segment in self.segments])
+
+        scores = np.empty(len(rows), dtype=np.float32)
+        owners = np.searchsorted(self.offsets, rows, side="right") - 1
+        for i, segment in enumerate(self.segments):
+            selected = owners == i
+            if selected.any():
+                scores[selected] = segment.vectors[rows[selected] - self.offsets[i]] @ query
+        return scores
+
+    def all_vectors(self) -> np.ndarray:
+        return np.concatenate([np.asarray(segment.vectors) for segment in self.segments])
+
+    def get_bm25(self) -> Bm25Index:
+        with self.lock:
+            if self.bm25 is None:
+                self.bm25 = Bm25Index([block["content"] for block in self.blocks])
+            return self.bm25
+
+    def get_ivf(self) -> Optional[IvfIndex]:
+        if not settings.LOCAL_SEARCH_IVF or len(self.blocks) < settings.LOCAL_SEARCH_IVF_MIN_VECTORS:
+            return None
+
+        with self.lock:
+            if self.ivf is None:
+                self.ivf = IvfIndex(self.all_vectors(), nlist=int(math.sqrt(len(self.blocks))))
+            return self.ivf
+
+class LocalVectorSearch(SearchBackend):
+    def __init__(self, path: str):
+        self.path = path
+        self.tenants: Dict[str, TenantIndex] = {}
+        self.lock = threading.Lock()
+
+    def tenant_key(self, user_id: Optional[uuid.UUID]) -> str:
+        return str(user_id) if user_id else "shared"
+
+    def tenant(self, key: str) -> TenantIndex:
+        # Tenants are loaded lazily on first use
+        with self.lock:
+            if key not in self.tenants:
+                self.tenants[key] = TenantIndex(os.path.join(self.path, key))
+            return self.tenants[key]
+
+    def all_tenants(self) -> Iterator[TenantIndex]:
+        if os.path.isdir(self.path):
+            for key in sorted(os.listdir(self.path)):
+                yield self.tenant(key)
+
+    def index_document(self, documents: Iterable[ElasticSearchDocument], **options) -> BulkIndexResult:
+        result = BulkIndexResult()
+        pending: Dict[str, Tuple[List[List[float]], List[dict]]] = defaultdict(lambda: ([], []))
+
+        def flush(key: str):
+            vectors, blocks = pending.pop(key)
+            matrix = np.asarray(vectors, dtype=np.float32)
+            matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+            self.tenant(key).append(matrix, blocks)
+            result.indexed += len(blocks)
+
+        for doc in documents:
+            if not doc.content.strip():
+                continue
+            if doc.embedding is None:
+                result.errors.append({"index": {"error": "missing embedding"}, "pdf_id": str(doc.pdf_id)})
+                continue
+
+            key = self.tenant_key(doc.user_id)
+            vectors, blocks = pending[key]
+            vectors.append(doc.embedding)
+            blocks.append({field: getattr(doc, field) for field in BLOCK_FIELDS} | {
+                "pdf_id": str(doc.pdf_id),
+                "user_id": str(doc.user_id) if doc.user_id else None,
+            })
+
+            if len(blocks) >= settings.LOCAL_SEARCH_FLUSH_SIZE:
+                flush(key)
+
+        for key in list(pending):
+            flush(key)
+
+        return result
+
+    def iter_pdf_blocks(self, pdf_id: Optional[uuid.UUID] = None, index_name: Optional[str] = None) -> Iterator[ElasticSearchDocument]:
+        for tenant in self.all_tenants():
+            with tenant.lock:
+                segments = list(tenant.segments)
+
+            for segment in segments:
+                for row, block in enumerate(segment.blocks):
+                    if pdf_id is None or block["pdf_id"] == str(pdf_id):
+                        yield ElasticSearchDocument(**block, embedding=np.asarray(segment.vectors[row]).tolist())
+
+    def delete_pdf_blocks(self, pdf_ids: Iterable[uuid.UUID], pages: Optional[Iterable[int]] = None) -> int:
+        pdf_ids = {str(pdf_id) for pdf_id in pdf_ids}
+        pages = set(pages) if pages is not None else None
+        deleted = 0
+
+        for tenant in self.all_tenants():
+            deleted += tenant.delete(
+                lambda block: block["pdf_id"] in pdf_ids and (pages is None or block["page_number"] in pages)
+            )
+
+        return deleted
+
+    def merge_segments(self) -> int:
+        return sum(tenant.merge_all() for tenant in self.all_tenants())
+
+    def iter_indexed_pdf_ids(self) -> Iterator[uuid.UUID]:
+        seen = set()
+        for tenant in self.all_tenants():
+            for pdf_id in tenant.pdf_ids:
+                if pdf_id not in seen:
+                    seen.add(pdf_id)
+                    yield uuid.UUID(pdf_id)
+
+    def iter_unowned_pdf_ids(self) -> Iterator[uuid.UUID]:
+        for pdf_id in set(self.tenant("shared").pdf_ids):
+            yield uuid.UUID(pdf_id)
+
+    def set_pdf_owner(self, pdf_id: uuid.UUID, user_id: uuid.UUID) -> int:
+        shared = self.tenant("shared")
+        moved = [document for document in self.iter_pdf_blocks(pdf_id) if document.user_id is None]
+        if not moved:
+            return 0
+
+        self.index_document(document.model_copy(update={"user_id": user_id}) for document in moved)
+        shared.delete(lambda block: block["pdf_id"] == str(pdf_id))
+        return len(moved)
+
+    def knn_scores(self, tenant: TenantIndex, query: np.ndarray, candidates: Optional[np.ndarray]) -> np.ndarray:
+        # Same scale as Elasticsearch's cosine similarity score
+        return (1 + tenant.dot(query, candidates)) / 2
+
+    def top_rows(self, rows: np.ndarray, scores: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        if not len(rows):
+            return []
+        k = min(k, len(rows))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(rows[i]), float(scores[i])) for i in top]
+
+    def search_tenant(self, tenant: TenantIndex, pdf_id, query_embedding, topk, query_text, mode, fusion, k, knn_weight) -> List[dict]:
+        with tenant.lock:
+            if not tenant.blocks:
+                return []
+
+            query = np.asarray(query_embedding, dtype=np.float32)
+            query /= max(np.linalg.norm(query), 1e-12)
+
+            candidates = None
+            if pdf_id:
+                candidates = np.flatnonzero(tenant.pdf_ids == str(pdf_id))
+            elif ivf := tenant.get_ivf():
+                candidates = ivf.candidates(query, settings.LOCAL_SEARCH_IVF_NPROBE)
+
+            knn_scores = self.knn_scores(tenant, query, candidates)
+            if candidates is None:
+                candidates = np.arange(len(tenant.blocks))
+
+            def as_hits(ranked: List[Tuple[int, float]]) -> List[dict]:
+                return [{"_id": str(row), "_score": score, "_source": tenant.blocks[row]} for row, score in ranked]
+
+            if mode == "knn" or not query_text:
+                return as_hits(self.top_rows(candidates, knn_scores, topk))
+
+            bm25_scores = tenant.get_bm25().scores(query_text)[candidates]
+
+            if fusion == "weighted":
+                return as_hits(self.top_rows(candidates, knn_weight * knn_scores + (1 - knn_weight) * bm25_scores, topk))
+
+            text_hits = as_hits([(row, score) for row, score in self.top_rows(candidates, bm25_scores, k) if score > 0])
+            knn_hits = as_hits(self.top_rows(candidates, knn_scores, k))
+            return reciprocal_rank_fusion([text_hits, knn_hits], topk)
+
+    async def search(
+        self,
+        user_id: uuid.UUID,
+        pdf_id: Optional[uuid.UUID],
+        query_embedding: List[float],
+        topk: int = 5,
+        query_text: Optional[str] = None,
+        mode: str = "knn",
+        fusion: str = "rrf",
+        k: Optional[int] = None,
+        num_candidates: Optional[int] = None,
+        knn_weight: float = 0.5,
+        highlight: bool = False,
+        group_by: Optional[GroupBy] = None,
+        inner_hits: int = 3
+    ) -> List[ElasticSearchResponse]:
+        # Scoring, BM25 and IVF builds are numpy work that would block the event loop
+        return await asyncio.to_thread(
+            self.search_blocks,
+            user_id, pdf_id, query_embedding, topk, query_text, mode, fusion, k, knn_weight, highlight, group_by, inner_hits
+        )
+
+    def search_blocks(self, user_id, pdf_id, query_embedding, topk, query_text, mode, fusion, k, knn_weight, highlight, group_by, inner_hits) -> List[ElasticSearchResponse]:
+        # Grouped results need enough blocks to fill topk groups
+        k = max(k or topk, topk * inner_hits if group_by else topk)
+
+        # Each user's vectors live in their own tenant, so scoping is free
+        hits = self.search_tenant(
+            self.tenant(self.tenant_key(user_id)),
+            pdf_id, query_embedding, k if group_by else topk, query_text, mode, fusion, k, knn_weight
+        )
+
+        if highlight and query_text:
+            for hit in hits:
+                hit["highlight"] = {"content": highlight_fragments(hit["_source"]["content"], query_text)}
+
+        if group_by:
+            hits = collapse_hits(hits, group_by, inner_hits, topk)
+
+        return hits_to_responses(hits)
@@ -0,0 +1,102 @@
+from app.config.config import settings
+from app.utils.metrics import observe_stage, ocr_images_skipped_total
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional, Set
+from PIL import Image
+import pytesseract
+import pymupdf
+import threading
+import io
+import os
+# Each tesseract process would otherwise start an OpenMP thread per core, on top of the
+# OCR pool's own parallelism. Tesseract subprocesses inherit this from the environment
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+ocr_executor: Optional[ThreadPoolExecutor] = None
+ocr_executor_lock = threading.Lock()
+ocr_threads = settings.OCR_THREADS
+
+def set_ocr_threads(threads: int):
+    global ocr_threads
+    ocr_threads = max(1, threads)
+
+def get_ocr_executor() -> ThreadPoolExecutor:
+    global ocr_executor
+
+    # Tesseract runs as a subprocess, so threads are enough to keep several of them busy
+    with ocr_executor_lock:
+        if ocr_executor is None:
+            ocr_executor = ThreadPoolExecutor(max_workers=ocr_threads, thread_name_prefix="ocr")
+
+    return ocr_executor
+
+def prepare_image(image: Image.Image, scale: float = 1.0) -> Image.Image:
+    image = image.convert("L")
+
+    if scale < 1.0:
+        width, height = image.size
+        image = image.resize((max(1, int(width * scale)), max(1, int(height * scale))), Image.LANCZOS)
+
+    return image
+
+def run_ocr(image: Image.Image, scale: float = 1.0) -> str:
+    with observe_stage("ocr"):
+        return pytesseract.image_to_string(prepare_image(image, scale), lang=settings.OCR_LANG).strip()
+
+def is_ocr_candidate(width: int, height: int) -> bool:
+    return (
+        width >= settings.OCR_MIN_IMAGE_SIZE
+        and height >= settings.OCR_MIN_IMAGE_SIZE
+        and width * height >= settings.OCR_MIN_IMAGE_AREA
+    )
+
+def image_scale(page: pymupdf.Page, xref: int, width: int) -> float:
+    # Downscale images embedded at a much higher resolution than they are displayed,
+    # Tesseract gains nothing from pixels above OCR_MAX_DPI
+    rects = page.get_image_rects(xref)
+    if not rects or rects[0].width <= 0:
+        return 1.0
+
+    dpi = width / (rects[0].width / 72)
+    return min(1.0, settings.OCR_MAX_DPI / dpi) if dpi > 0 else 1.0
+
+class OcrSession:
+    def __init__(self, pdf: pymupdf.Document):
+        self.pdf = pdf
+        self.seen_xrefs: Set[int] = set()
+        self.skipped_images = 0
+
+    def submit_image(self, page: pymupdf.Page, xref: int, width: int, height: int) -> Optional[Future]:
+        # Repeated images (logos, headers) are only OCR'd on the first page they appear on
+        if xref in self.seen_xrefs:
+            self.skipped_images += 1
+            ocr_images_skipped_total.inc()
+            return None
+        self.seen_xrefs.add(xref)
+
+        # Sizes come from the page's image list, small images are skipped before being decoded
+        if not is_ocr_candidate(width, height):
+            self.skipped_images += 1
+            ocr_images_skipped_total.inc()
+            return None
+
+        base_image = self.pdf.extract_image(xref)
+
+        pil_image = Image.open(io.BytesIO(base_image["image"]))
+        scale = image_scale(page, xref, base_image["width"])
+
+        return get_ocr_executor().submit(run_ocr, pil_image, scale)
+
+    def submit_page(self, page: pymupdf.Page) -> Future:
+        pixmap = page.get_pixmap(dpi=settings.OCR_RENDER_DPI, colorspace=pymupdf.csGRAY)
+        pil_image = Image.frombytes("L", (pixmap.width, pixmap.height), pixmap.samples)
+
+        return get_ocr_executor().submit(run_ocr, pil_image)
+
+def shutdown_ocr_executor():
+    global ocr_executor
+
+    with ocr_executor_lock:
+        if ocr_executor is not None:
+            ocr_executor.shutdown(wait=True, cancel_futures=True)
+            ocr_executor = None
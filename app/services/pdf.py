@@ -1,10 +1,14 @@
 from app.schemas.pdf_schema import PdfDocumentCreate
 from app.db.database import get_db
+from sqlalchemy import or_, tuple_
 from sqlalchemy.orm import Session
 from fastapi import Depends
+import base64
 import datetime
 import uuid
-from app.models import PdfDocument
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+from app.models import PdfDocument, PdfPage
+from app.services.identity_cache import invalidate_user_pdfs
 
 def create_pdf_document(pdf_document: PdfDocumentCreate, db: Session = Depends(get_db)):
     pdf = PdfDocument(**pdf_document.dict(), created_at=datetime.datetime.now())
@@ -12,10 +16,74 @@ def create_pdf_document(pdf_document: PdfDocumentCreate, db: Session = Depends(g
     db.add(pdf)
     db.commit()
     db.refresh(pdf)
+    invalidate_user_pdfs(pdf.user_id)
     return pdf
 
 def get_pdf_document(pdf_id: uuid.UUID, db: Session = Depends(get_db)):
     return db.query(PdfDocument).filter(PdfDocument.id == pdf_id).first()
 
-def get_user_pdfs(user_id: uuid.UUID, db: Session = Depends(get_db)):
-    return db.query(PdfDocument).filter(PdfDocument.user_id == user_id).all()
+def get_pdf_document_by_hash(content_hash: str, db: Session = Depends(get_db)):
+    # Only fully indexed documents can be copied, rows stored before statuses existed have none
+    return db.query(PdfDocument).filter(
+        PdfDocument.content_hash == content_hash,
+        or_(PdfDocument.status == "ready", PdfDocument.status.is_(None))
+    ).order_by(PdfDocument.created_at).first()
+
+def encode_cursor(created_at: datetime.datetime, pdf_id: uuid.UUID) -> str:
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{pdf_id}".encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[datetime.datetime, uuid.UUID]:
+    created_at, pdf_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+    return datetime.datetime.fromisoformat(created_at), uuid.UUID(pdf_id)
+
+def list_user_pdfs(
+    user_id: uuid.UUID,
+    db: Session = Depends(get_db),
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    fields: Optional[Sequence[str]] = None
+) -> Tuple[List[dict], Optional[str]]:
+    # Keyset pagination on (user_id, created_at, id), every page is one range scan of
+    # ix_pdf_documents_user_created_id however deep into the library it is
+    fields = list(dict.fromkeys(fields or PdfDocument.__table__.columns.keys()))
+    columns = [getattr(PdfDocument, field) for field in dict.fromkeys([*fields, "created_at", "id"])]
+
+    query = db.query(*columns).filter(PdfDocument.user_id == user_id)
+    if cursor:
+        query = query.filter(tuple_(PdfDocument.created_at, PdfDocument.id) < decode_cursor(cursor))
+
+    rows = query.order_by(PdfDocument.created_at.desc(), PdfDocument.id.desc()).limit(limit + 1).all()
+
+    # One extra row tells whether there is a next page
+    next_cursor = encode_cursor(rows[limit - 1].created_at, rows[limit - 1].id) if len(rows) > limit else None
+
+    return [{field: getattr(row, field) for field in fields} for row in rows[:limit]], next_cursor
+
+def get_page_hashes(pdf_id: uuid.UUID, db: Session = Depends(get_db)) -> Dict[int, str]:
+    rows = db.query(PdfPage.page_number, PdfPage.content_hash).filter(PdfPage.pdf_id == pdf_id).all()
+    return {page_number: content_hash for page_number, content_hash in rows}
+
+def save_page_hashes(pdf_id: uuid.UUID, page_hashes: Dict[int, str], db: Session = Depends(get_db)):
+    db.query(PdfPage).filter(PdfPage.pdf_id == pdf_id).delete(synchronize_session=False)
+    db.add_all(
+        PdfPage(pdf_id=pdf_id, page_number=page_number, content_hash=content_hash)
+        for page_number, content_hash in page_hashes.items()
+    )
+    db.commit()
+
+def delete_page_hashes(pdf_id: uuid.UUID, pages: List[int], db: Session = Depends(get_db)):
+    db.query(PdfPage).filter(PdfPage.pdf_id == pdf_id, PdfPage.page_number.in_(pages)).delete(synchronize_session=False)
+    db.commit()
+
+def update_pdf_document(pdf_id: uuid.UUID, db: Session = Depends(get_db), **fields):
+    db.query(PdfDocument).filter(PdfDocument.id == pdf_id).update(fields, synchronize_session=False)
+    db.commit()
+
+def delete_pdf_document(pdf: PdfDocument, db: Session = Depends(get_db)):
+    db.query(PdfPage).filter(PdfPage.pdf_id == pdf.id).delete(synchronize_session=False)
+    db.delete(pdf)
+    db.commit()
+    invalidate_user_pdfs(pdf.user_id)
+
+def get_all_pdf_ids(db: Session = Depends(get_db)) -> Set[uuid.UUID]:
+    return {pdf_id for (pdf_id,) in db.query(PdfDocument.id).all()}
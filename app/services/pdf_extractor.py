@@ -1,19 +1,28 @@
 from pydantic import BaseModel
-from typing import Literal, Union, List
-from PIL import Image
-import pytesseract
+from typing import Dict, Iterable, Iterator, Literal, Optional, Sequence, Tuple, Union, List
+from concurrent.futures import Future, ProcessPoolExecutor
+from collections import deque
+from app.config.config import settings
+from app.services.ocr import OcrSession, set_ocr_threads
+from app.services.table_detector import find_tables, inside_tables
+import hashlib
+import multiprocessing
 import pymupdf
-import io
+import tempfile
+import threading
 
 class ExtractedContentFormat(BaseModel):
     type: Literal["text", "table", "image"]
     page_number: int
     block_index: int
+    block_end_index: Optional[int] = None
+    chunk_index: int = 0
     content: str
     error: Union[str, None] = None
 
 class ExtractedContent(BaseModel):
     all_content: List[ExtractedContentFormat] = []
+    failed_pages: Dict[int, str] = {}
     error: Union[str, None] = None
 
 
@@ -35,80 +44,309 @@ def format_table_content(table_data: List[List[str]]) -> str:
     return formatted_data.strip()
 
 
-def extract_pdf_content(pdf_content: bytes) -> ExtractedContent:
-    extracted_data = ExtractedContent()
+def open_pdf(pdf_content: Union[bytes, str]) -> pymupdf.Document:
+    if isinstance(pdf_content, str):
+        return pymupdf.open(pdf_content, filetype="pdf")
+    return pymupdf.open(stream=pdf_content, filetype="pdf")
+
 
+def get_page_count(pdf_content: Union[bytes, str]) -> int:
+    pdf = open_pdf(pdf_content)
     try:
-        pdf = pymupdf.open(stream=pdf_content, filetype="pdf")
+        return pdf.page_count
+    finally:
+        pdf.close()
+
+
+def extract_page_content(pdf: pymupdf.Document, page_num: int, ocr_session: OcrSession) -> Tuple[List[ExtractedContentFormat], List[Tuple[int, Future]]]:
+    page_content: List[ExtractedContentFormat] = []
+    ocr_jobs: List[Tuple[int, Future]] = []
+    page = pdf.load_page(page_num)
+
+    # 1. Extract Tables
+    table_content: List[ExtractedContentFormat] = []
+    table_bboxes = []
+    for idx, table in enumerate(find_tables(page)):
+        try:
+            table_data = table.extract()
+            content = format_table_content(table_data=table_data)
+            if content:
+                table_content.append(ExtractedContentFormat(
+                    type="table",
+                    page_number=page_num,
+                    block_index=idx,
+                    content=content
+                ))
+                table_bboxes.append(tuple(table.bbox))
+        except Exception as e:
+            print(f"Error extracting table on page {page_num}, table {idx}: {e}")
+            table_content.append(ExtractedContentFormat(
+                type="table",
+                page_number=page_num,
+                block_index=idx,
+                content="",
+                error=f"Failed to extract table: {e}"
+            ))
+
+    # 2. Extract text blocks, skipping the ones already embedded as part of a table
+    text_blocks = page.get_text("blocks")
+    for idx, block in enumerate(text_blocks):
+        content = block[4].strip()
+        if content and not inside_tables(block[:4], table_bboxes):
+            page_content.append(ExtractedContentFormat(
+                type="text",
+                page_number=page_num,
+                block_index=idx,
+                content=content
+            ))
+
+    page_content.extend(table_content)
+
+    # 3. Extract Images
+    if settings.OCR_MODE == "off":
+        return page_content, ocr_jobs
+
+    images = page.get_images(full=True)
+
+    # Scanned page without a text layer, OCR the rendered page once instead of every image on it
+    if settings.OCR_MODE == "auto" and images and not page_content:
+        ocr_jobs.append((0, ocr_session.submit_page(page)))
+        return page_content, ocr_jobs
+
+    for idx, img_info in enumerate(images):
+        xref, width, height = img_info[0], img_info[2], img_info[3]
+
+        try:
+            future = ocr_session.submit_image(page, xref, width, height)
+            if future is not None:
+                ocr_jobs.append((idx, future))
+        except Exception as e:
+            print(f"Error extracting image on page {page_num}, image {idx}: {e}")
+
+    return page_content, ocr_jobs
+
+
+def collect_ocr_content(page_num: int, ocr_jobs: List[Tuple[int, Future]]) -> List[ExtractedContentFormat]:
+    page_content: List[ExtractedContentFormat] = []
+
+    for idx, future in ocr_jobs:
+        try:
+            ocr_text = future.result()
+            if ocr_text:
+                page_content.append(ExtractedContentFormat(
+                    type="image",
+                    page_number=page_num,
+                    block_index=idx,
+                    content=ocr_text
+                ))
+        except Exception as e:
+            print(f"Error extracting image on page {page_num}, image {idx}: {e}")
+
+    return page_content
+
 
+def extract_pages(pdf: pymupdf.Document, page_numbers: Sequence[int], ocr_session: Optional[OcrSession] = None) -> Tuple[List[ExtractedContentFormat], Dict[int, str]]:
+    ocr_session = ocr_session or OcrSession(pdf)
+    pages: List[Tuple[int, List[ExtractedContentFormat], List[Tuple[int, Future]]]] = []
+    failed_pages: Dict[int, str] = {}
+
+    # OCR for all the pages runs on the thread pool while the remaining pages are parsed
+    for page_num in page_numbers:
+        try:
+            page_content, ocr_jobs = extract_page_content(pdf, page_num, ocr_session)
+            pages.append((page_num, page_content, ocr_jobs))
+        except Exception as e:
+            print(f"Error extracting page {page_num}: {e}")
+            failed_pages[page_num] = str(e)
+
+    pages_content: List[ExtractedContentFormat] = []
+    for page_num, page_content, ocr_jobs in pages:
+        pages_content.extend(page_content)
+        pages_content.extend(collect_ocr_content(page_num, ocr_jobs))
+
+    return pages_content, failed_pages
+
+
+def stream_pages(pdf: pymupdf.Document, page_numbers: Sequence[int], lookahead: int) -> Iterator[Tuple[List[ExtractedContentFormat], Dict[int, str]]]:
+    # Parsing runs up to `lookahead` pages ahead of the page being yielded, so the OCR of those
+    # pages overlaps on the thread pool. Pages are still yielded one at a time, in order
+    ocr_session = OcrSession(pdf)
+    pending = deque()
+
+    def finish():
+        page_num, page_content, ocr_jobs, error = pending.popleft()
+        if error is not None:
+            return [], {page_num: error}
+        return page_content + collect_ocr_content(page_num, ocr_jobs), {}
+
+    for page_num in page_numbers:
+        try:
+            page_content, ocr_jobs = extract_page_content(pdf, page_num, ocr_session)
+            pending.append((page_num, page_content, ocr_jobs, None))
+        except Exception as e:
+            print(f"Error extracting page {page_num}: {e}")
+            pending.append((page_num, [], [], str(e)))
+
+        if len(pending) > lookahead:
+            yield finish()
+
+    while pending:
+        yield finish()
+
+
+def extract_pages_worker(file_path: str, page_numbers: List[int]) -> Tuple[List[ExtractedContentFormat], Dict[int, str]]:
+    # Runs in a pool process, every worker opens its own handle on the spooled file
+    pdf = open_pdf(file_path)
+    try:
+        return extract_pages(pdf, page_numbers)
+    finally:
+        pdf.close()
+
+
+def compute_page_hashes(pdf_content: Union[bytes, str]) -> Dict[int, str]:
+    # Fingerprint of what extraction sees on a page: its text layer plus the digests of its images
+    page_hashes: Dict[int, str] = {}
+    pdf = open_pdf(pdf_content)
+
+    try:
         for page_num in range(pdf.page_count):
             page = pdf.load_page(page_num)
+            page_hash = hashlib.sha256(page.get_text("text").encode("utf-8"))
+            for image in page.get_image_info(hashes=True):
+                page_hash.update(image.get("digest", b""))
+            page_hashes[page_num] = page_hash.hexdigest()
+    finally:
+        pdf.close()
 
-            # 1. Extract text blocks
-            text_blocks = page.get_text("blocks")
-            for idx, block in enumerate(text_blocks):
-                content = block[4].strip()
-                if content:
-                    extracted_data.all_content.append(ExtractedContentFormat(
-                        type="text",
-                        page_number=page_num,
-                        block_index=idx,
-                        content=content
-                    ))
-
-            # 2. Extract Tables
-            tables = page.find_tables()
-            for idx, table in enumerate(tables):
-                try:
-                    table_data = table.extract()
-                    content = format_table_content(table_data=table_data)
-                    if content:
-                        extracted_data.all_content.append(ExtractedContentFormat(
-                            type="table",
-                            page_number=page_num,
-                            block_index=idx,
-                            content=content
-                        ))
-                except Exception as e:
-                    print(f"Error extracting table on page {page_num}, table {idx}: {e}")
-                    extracted_data.all_content.append(ExtractedContentFormat(
-                        type="table",
-                        page_number=page_num,
-                        block_index=idx,
-                        content="",
-                        error=f"Failed to extract table: {e}"
-                    ))
-
-            # 3. Extract Images
-            images = page.get_images(full=True)
-            for idx, img_info in enumerate(images):
-                xref = img_info[0]
-
-                try:
-                    base_image = pdf.extract_image(xref)
-                    image_bytes = base_image["image"]
-
-                    image_stream = io.BytesIO(image_bytes)
-                    pil_image = Image.open(image_stream)
-
-                    # OCR
-                    ocr_text = pytesseract.image_to_string(pil_image, lang="eng").strip()
-
-                    if ocr_text:
-                        extracted_data.all_content.append(ExtractedContentFormat(
-                            type="image",
-                            page_number=page_num,
-                            block_index=idx,
-                            content=ocr_text
-                        ))
-
-                except Exception as e:
-                    print(f"Error extracting image on page {page_num}, image {idx}: {e}")
+    return page_hashes
 
-        pdf.close()
+
+extraction_executor: Optional[ProcessPoolExecutor] = None
+extraction_executor_lock = threading.Lock()
+
+def init_extraction_worker(workers: int):
+    # Every worker has its own OCR pool, OCR_THREADS is shared between them
+    set_ocr_threads(settings.OCR_THREADS // workers)
+
+
+def get_extraction_executor() -> ProcessPoolExecutor:
+    global extraction_executor
+
+    with extraction_executor_lock:
+        if extraction_executor is None:
+            extraction_executor = ProcessPoolExecutor(
+                max_workers=settings.EXTRACTION_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_extraction_worker,
+                initargs=(settings.EXTRACTION_WORKERS,)
+            )
+
+    return extraction_executor
+
+def shutdown_extraction_executor():
+    global extraction_executor
+
+    with extraction_executor_lock:
+        if extraction_executor is not None:
+            extraction_executor.shutdown(wait=True, cancel_futures=True)
+            extraction_executor = None
+
+
+def page_groups(page_numbers: List[int], pages_per_task: int) -> Iterator[List[int]]:
+    for start in range(0, len(page_numbers), pages_per_task):
+        yield page_numbers[start:start + pages_per_task]
+
+
+def stream_page_groups(tasks: Iterator[Tuple[int, str, List[int]]]) -> Iterator[Tuple[int, List[ExtractedContentFormat], Dict[int, str]]]:
+    executor = get_extraction_executor()
+
+    # Only a bounded number of page groups is in flight, results are yielded back in task order
+    max_in_flight = settings.EXTRACTION_WORKERS * 2
+    in_flight = deque()
+
+    try:
+        while True:
+            for file_index, file_path, group in tasks:
+                in_flight.append((file_index, group, executor.submit(extract_pages_worker, file_path, group)))
+                if len(in_flight) >= max_in_flight:
+                    break
+
+            if not in_flight:
+                return
+
+            file_index, group, future = in_flight.popleft()
+            try:
+                yield (file_index, *future.result())
+            except Exception as e:
+                print(f"Error extracting pages {group[0]}-{group[-1]}: {e}")
+                yield file_index, [], {page_num: str(e) for page_num in group}
+    finally:
+        for _, _, future in in_flight:
+            future.cancel()
+
+
+def stream_pdf_content_parallel(file_path: str, page_numbers: List[int], pages_per_task: int) -> Iterator[Tuple[List[ExtractedContentFormat], Dict[int, str]]]:
+    tasks = ((0, file_path, group) for group in page_groups(page_numbers, pages_per_task))
+    for _, page_content, failed_pages in stream_page_groups(tasks):
+        yield page_content, failed_pages
+
+
+def stream_files_content(file_paths: List[str]) -> Iterator[Tuple[int, List[ExtractedContentFormat], Dict[int, str]]]:
+    # Page groups of every file go through one pool, so workers stay busy across file boundaries
+    # instead of draining at the end of each file
+    def tasks():
+        for file_index, file_path in enumerate(file_paths):
+            try:
+                page_count = get_page_count(file_path)
+            except Exception as e:
+                print(f"Error opening {file_path}: {e}")
+                continue
+
+            for group in page_groups(list(range(page_count)), settings.EXTRACTION_PAGES_PER_TASK):
+                yield file_index, file_path, group
+
+    if settings.EXTRACTION_WORKERS <= 1:
+        for file_index, file_path in enumerate(file_paths):
+            for page_content, failed_pages in stream_pdf_content(file_path):
+                yield file_index, page_content, failed_pages
+        return
+
+    yield from stream_page_groups(tasks())
+
+
+def stream_pdf_content(pdf_content: Union[bytes, str], pages: Optional[Iterable[int]] = None) -> Iterator[Tuple[List[ExtractedContentFormat], Dict[int, str]]]:
+    pdf = open_pdf(pdf_content)
+    page_numbers = sorted(pages) if pages is not None else list(range(pdf.page_count))
+
+    if settings.EXTRACTION_WORKERS <= 1 or len(page_numbers) < settings.EXTRACTION_PARALLEL_MIN_PAGES:
+        try:
+            yield from stream_pages(pdf, page_numbers, settings.OCR_THREADS)
+        finally:
+            pdf.close()
+        return
+
+    pdf.close()
+
+    if isinstance(pdf_content, str):
+        yield from stream_pdf_content_parallel(pdf_content, page_numbers, settings.EXTRACTION_PAGES_PER_TASK)
+        return
+
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as spool:
+        spool.write(pdf_content)
+        spool.flush()
+        yield from stream_pdf_content_parallel(spool.name, page_numbers, settings.EXTRACTION_PAGES_PER_TASK)
+
+
+def extract_pdf_content(pdf_content: Union[bytes, str]) -> ExtractedContent:
+    extracted_data = ExtractedContent()
+
+    try:
+        for page_content, failed_pages in stream_pdf_content(pdf_content):
+            extracted_data.all_content.extend(page_content)
+            extracted_data.failed_pages.update(failed_pages)
 
     except Exception as e:
         print(f"Error processing PDF: {e}")
         extracted_data.error = f"An error occurred during PDF processing: {e}"
 
-    return extracted_data
\ No newline at end of file
+    return extracted_data
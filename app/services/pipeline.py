@@ -0,0 +1,278 @@
+from app.config.config import settings
+from app.services.pdf_extractor import ExtractedContentFormat, stream_files_content, stream_pdf_content
+from app.services.embedding import embedding_service
+from app.services.chunker import create_chunker
+from app.services.search_backend import BulkIndexResult, ElasticSearchDocument
+from app.services.search import search_service
+from app.utils.metrics import blocks_total, index_failures_total, stage_duration_seconds
+from pydantic import BaseModel
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+import bisect
+import queue
+import threading
+import time
+import uuid
+
+PIPELINE_DONE = object()
+
+# Extracted content of one PDF: (target index, blocks, failed pages)
+TargetContent = Tuple[int, List[ExtractedContentFormat], Dict[int, str]]
+
+class PipelineResult(BaseModel):
+    block_count: int = 0
+    indexed: int = 0
+    failed_pages: Dict[int, str] = {}
+    index_errors: List[Dict[str, Any]] = []
+    stage_timings: Dict[str, float] = {}
+
+class PageProgress:
+    # Share of a target's pages whose blocks reached the indexing stage. Pages arrive in order,
+    # so every page before the one being indexed is done
+    def __init__(self, pages: Iterable[int], callback: Callable[[float], None], step: float = 0.05):
+        self.pages = sorted(pages)
+        self.callback = callback
+        self.step = step
+        self.last_page = -1
+        self.reported = 0.0
+
+    def advance(self, page_number: int):
+        if page_number <= self.last_page or not self.pages:
+            return
+        self.last_page = page_number
+
+        done = bisect.bisect_left(self.pages, page_number) / len(self.pages)
+        if done - self.reported >= self.step:
+            self.reported = done
+            try:
+                self.callback(done)
+            except Exception as e:
+                print(f"Error reporting ingestion progress: {e}")
+
+# Extract -> embed -> index, connected by bounded queues so the stages overlap
+# and only a few batches of blocks are held in memory at any time.
+# A pipeline can ingest several PDFs (targets) at once, their blocks share embedding batches and bulk requests
+class IngestionPipeline:
+    def __init__(
+        self,
+        targets: List[Tuple[uuid.UUID, uuid.UUID]],
+        batch_size: int = None,
+        queue_size: int = None,
+        progress: Optional[List[Optional[PageProgress]]] = None
+    ):
+        self.targets = targets
+        self.progress = {pdf_id: target_progress for (pdf_id, _), target_progress in zip(targets, progress or []) if target_progress}
+        self.batch_size = batch_size or settings.EMBEDDING_BATCH_SIZE
+        self.blocks_queue: queue.Queue = queue.Queue(maxsize=queue_size or settings.PIPELINE_QUEUE_SIZE)
+        self.documents_queue: queue.Queue = queue.Queue(maxsize=queue_size or settings.PIPELINE_QUEUE_SIZE)
+        self.stop_event = threading.Event()
+        self.errors: List[Exception] = []
+        self.results = [PipelineResult() for _ in targets]
+        self.stage_timings: Dict[str, float] = {}
+        self.timings_lock = threading.Lock()
+        # Time the indexer spent waiting for embedded documents, the rest of the bulk call is indexing
+        self.index_wait = 0.0
+
+    def add_timing(self, stage: str, seconds: float):
+        with self.timings_lock:
+            self.stage_timings[stage] = round(self.stage_timings.get(stage, 0.0) + seconds, 4)
+
+    def put(self, stage_queue: queue.Queue, item) -> bool:
+        while not self.stop_event.is_set():
+            try:
+                stage_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(self, stage_queue: queue.Queue):
+        while True:
+            try:
+                return stage_queue.get(timeout=0.1)
+            except queue.Empty:
+                if self.stop_event.is_set():
+                    return PIPELINE_DONE
+
+    def fail(self, error: Exception):
+        self.errors.append(error)
+        self.stop_event.set()
+
+    def extract_stage(self, content: Iterator[TargetContent]):
+        batch: List[Tuple[int, ExtractedContentFormat]] = []
+
+        try:
+            chunker = create_chunker(embedding_service.model.tokenizer)
+
+            start = time.perf_counter()
+            for target, page_content, failed_pages in content:
+                self.results[target].failed_pages.update(failed_pages)
+                page_content = [item for item in page_content if item.content.strip()]
+                for item in page_content:
+                    blocks_total.labels(type=item.type).inc()
+                batch.extend((target, item) for item in (chunker.chunk_page(page_content) if chunker else page_content))
+
+                while len(batch) >= self.batch_size:
+                    self.add_timing("extract", time.perf_counter() - start)
+                    if not self.put(self.blocks_queue, batch[:self.batch_size]):
+                        return
+                    batch = batch[self.batch_size:]
+                    start = time.perf_counter()
+
+            self.add_timing("extract", time.perf_counter() - start)
+            if batch:
+                self.put(self.blocks_queue, batch)
+
+        except Exception as e:
+            print(f"Error in extraction stage: {e}")
+            self.fail(e)
+
+        finally:
+            self.put(self.blocks_queue, PIPELINE_DONE)
+
+    def embed_stage(self):
+        try:
+            while (batch := self.get(self.blocks_queue)) is not PIPELINE_DONE:
+                start = time.perf_counter()
+                embeddings = embedding_service.create_embeddings([item.content for _, item in batch], batch_size=self.batch_size)
+
+                documents = [
+                    ElasticSearchDocument(
+                        pdf_id=self.targets[target][0],
+                        user_id=self.targets[target][1],
+                        type=item.type,
+                        page_number=item.page_number,
+                        block_index=item.block_index,
+                        block_end_index=item.block_end_index,
+                        chunk_index=item.chunk_index,
+                        content=item.content,
+                        embedding=embedding.tolist()
+                    )
+                    for (target, item), embedding in zip(batch, embeddings)
+                ]
+                self.add_timing("embed", time.perf_counter() - start)
+
+                for target, _ in batch:
+                    self.results[target].block_count += 1
+                if not self.put(self.documents_queue, documents):
+                    return
+
+        except Exception as e:
+            print(f"Error in embedding stage: {e}")
+            self.fail(e)
+
+        finally:
+            self.put(self.documents_queue, PIPELINE_DONE)
+
+    def indexed_documents(self):
+        while True:
+            start = time.perf_counter()
+            documents = self.get(self.documents_queue)
+            self.index_wait += time.perf_counter() - start
+            if documents is PIPELINE_DONE:
+                return
+
+            for document in documents:
+                if document.pdf_id in self.progress:
+                    self.progress[document.pdf_id].advance(document.page_number)
+                yield document
+
+    def run(self, content: Iterator[TargetContent]) -> List[PipelineResult]:
+        stages = [
+            threading.Thread(target=self.extract_stage, args=(content,), name="pipeline-extract", daemon=True),
+            threading.Thread(target=self.embed_stage, name="pipeline-embed", daemon=True),
+        ]
+        for stage in stages:
+            stage.start()
+
+        try:
+            start = time.perf_counter()
+            index_result = search_service.index_document(self.indexed_documents())
+            elapsed = time.perf_counter() - start
+            self.add_timing("pipeline", elapsed)
+            self.add_timing("index", max(0.0, elapsed - self.index_wait))
+
+            self.assign_index_result(index_result)
+            index_failures_total.inc(len(index_result.errors))
+        except Exception as e:
+            print(f"Error in indexing stage: {e}")
+            self.fail(e)
+        finally:
+            for stage in stages:
+                stage.join()
+
+        if self.errors:
+            raise self.errors[0]
+
+        for stage, seconds in self.stage_timings.items():
+            stage_duration_seconds.labels(stage=stage).observe(seconds)
+
+        for result in self.results:
+            result.stage_timings = dict(self.stage_timings)
+
+        return self.results
+
+    def assign_index_result(self, index_result: BulkIndexResult):
+        targets = {str(pdf_id): target for target, (pdf_id, _) in enumerate(self.targets)}
+
+        for error in index_result.errors:
+            target = targets.get(error.get("pdf_id"))
+            # Failures that can't be traced back to a PDF count against all of them
+            for result in (self.results if target is None else [self.results[target]]):
+                result.index_errors.append(error)
+
+        for result in self.results:
+            result.indexed = max(0, result.block_count - len(result.index_errors))
+
+def with_embeddings(documents: Iterable[ElasticSearchDocument], batch_size: Optional[int] = None) -> Iterator[ElasticSearchDocument]:
+    # Indices that exclude vectors from _source return blocks without them, these are
+    # re-embedded in batches (mostly embedding cache hits)
+    batch_size = batch_size or settings.EMBEDDING_BATCH_SIZE
+    batch: List[ElasticSearchDocument] = []
+
+    def embed_batch():
+        missing = [document for document in batch if document.embedding is None]
+        if missing:
+            embeddings = embedding_service.create_embeddings([document.content for document in missing], batch_size=batch_size)
+            for document, embedding in zip(missing, embeddings):
+                document.embedding = embedding.tolist()
+        return batch
+
+    for document in documents:
+        batch.append(document)
+        if len(batch) >= batch_size:
+            yield from embed_batch()
+            batch = []
+
+    if batch:
+        yield from embed_batch()
+
+def reuse_pdf_blocks(source_pdf_id: uuid.UUID, pdf_id: uuid.UUID, user_id: uuid.UUID) -> PipelineResult:
+    result = PipelineResult()
+
+    def copied_documents():
+        for document in with_embeddings(search_service.iter_pdf_blocks(source_pdf_id)):
+            result.block_count += 1
+            yield document.model_copy(update={"pdf_id": pdf_id, "user_id": user_id})
+
+    start = time.perf_counter()
+    index_result = search_service.index_document(copied_documents())
+    result.stage_timings["reuse"] = round(time.perf_counter() - start, 4)
+
+    result.indexed = index_result.indexed
+    result.index_errors = index_result.errors
+    return result
+
+def run_ingestion_pipeline(
+    pdf_id: uuid.UUID,
+    user_id: uuid.UUID,
+    pdf_content: Union[bytes, str],
+    pages: Optional[Iterable[int]] = None,
+    progress: Optional[PageProgress] = None
+) -> PipelineResult:
+    content = ((0, page_content, failed_pages) for page_content, failed_pages in stream_pdf_content(pdf_content, pages))
+    return IngestionPipeline([(pdf_id, user_id)], progress=[progress]).run(content)[0]
+
+def run_batch_pipeline(targets: List[Tuple[uuid.UUID, uuid.UUID, str]], progress: Optional[List[Optional[PageProgress]]] = None) -> List[PipelineResult]:
+    # Page groups of all the files share the extraction pool, their blocks share embedding batches and bulk requests
+    content = stream_files_content([file_path for _, _, file_path in targets])
+    return IngestionPipeline([(pdf_id, user_id) for pdf_id, user_id, _ in targets], progress=progress).run(content)
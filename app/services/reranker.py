@@ -0,0 +1,81 @@
+from sentence_transformers import CrossEncoder
+from app.config.config import settings
+from app.services.cache import LRUCache
+from app.services.search_backend import ElasticSearchResponse
+from app.utils.concurrency import run_in_rerank_executor
+from app.utils.metrics import observe_stage, rerank_total
+from typing import List, Optional
+import asyncio
+import hashlib
+import threading
+import time
+
+class RerankerService:
+    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"):
+        self.model_name = model_name
+        self._model: Optional[CrossEncoder] = None
+        self.model_lock = threading.Lock()
+        self.cache = LRUCache(settings.RERANK_CACHE_SIZE, name="rerank")
+
+    @property
+    def model(self) -> CrossEncoder:
+        if self._model is None:
+            with self.model_lock:
+                if self._model is None:
+                    self._model = CrossEncoder(self.model_name, device="cpu", max_length=settings.RERANK_MAX_LENGTH)
+        return self._model
+
+    def warm_up(self):
+        start = time.perf_counter()
+        self.model.predict([("warm up", "warm up")], show_progress_bar=False)
+        print(f"Re-ranking model {self.model_name} ready in {time.perf_counter() - start:.2f}s.")
+
+    def key(self, query: str, content: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{query}\0{content}".encode("utf-8")).hexdigest()
+
+    def score(self, query: str, contents: List[str]) -> List[float]:
+        query = " ".join(query.split())
+        keys = [self.key(query, content) for content in contents]
+        scores = [self.cache.get(key) for key in keys]
+
+        # Only pairs that were never scored go through the model, in one batch
+        missing = [i for i, score in enumerate(scores) if score is None]
+        if missing:
+            predicted = self.model.predict(
+                [(query, contents[i]) for i in missing],
+                batch_size=settings.RERANK_BATCH_SIZE,
+                show_progress_bar=False
+            )
+            for i, score in zip(missing, predicted):
+                scores[i] = float(score)
+                self.cache.put(keys[i], scores[i])
+
+        return scores
+
+    def rerank(self, query: str, results: List[ElasticSearchResponse], topk: int) -> List[ElasticSearchResponse]:
+        scores = self.score(query, [result.content for result in results])
+        ranked = sorted(zip(scores, results), key=lambda pair: pair[0], reverse=True)[:topk]
+        return [result.model_copy(update={"score": score}) for score, result in ranked]
+
+reranker_service = RerankerService(settings.RERANK_MODEL)
+
+async def rerank_with_budget(query: str, results: List[ElasticSearchResponse], topk: int, budget_ms: int) -> List[ElasticSearchResponse]:
+    # Past the budget the first-stage order is returned, the scoring keeps running
+    # in the background and fills the cache for the next identical search
+    try:
+        with observe_stage("rerank"):
+            reranked = await asyncio.wait_for(
+                run_in_rerank_executor(reranker_service.rerank, query, results, topk),
+                timeout=budget_ms / 1000
+            )
+        rerank_total.labels(result="applied").inc()
+        return reranked
+
+    except asyncio.TimeoutError:
+        rerank_total.labels(result="timeout").inc()
+
+    except Exception as e:
+        print(f"Error re-ranking search results: {e}")
+        rerank_total.labels(result="error").inc()
+
+    return results[:topk]
@@ -0,0 +1,15 @@
+from app.config.config import settings
+from app.services.search_backend import SearchBackend
+
+def create_search_backend(backend: str) -> SearchBackend:
+    if backend == "elasticsearch":
+        from app.services.elastic_search import ElasticSearchService
+        return ElasticSearchService()
+
+    if backend == "local":
+        from app.services.local_search import LocalVectorSearch
+        return LocalVectorSearch(settings.LOCAL_SEARCH_DIR)
+
+    raise ValueError(f"Unknown search backend: {backend}")
+
+search_service = create_search_backend(settings.SEARCH_BACKEND)
@@ -0,0 +1,176 @@
+from abc import ABC, abstractmethod
+from app.config.config import settings
+from app.services.pdf_extractor import ExtractedContentFormat
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, List, Literal, Optional
+from pydantic import BaseModel, Field
+import re
+import uuid
+
+GroupBy = Literal["pdf", "page"]
+
+class SearchRequest(BaseModel):
+    query: str
+    pdf_id: Optional[uuid.UUID] = None
+    mode: Literal["knn", "hybrid"] = settings.SEARCH_MODE
+    fusion: Literal["rrf", "weighted"] = "rrf"
+    topk: int = Field(5, ge=1, le=100)
+    k: Optional[int] = Field(None, ge=1, le=1000)
+    num_candidates: Optional[int] = Field(None, ge=1, le=10000)
+    knn_weight: float = Field(0.5, ge=0, le=1)
+    highlight: bool = False
+    group_by: Optional[GroupBy] = None
+    inner_hits: int = Field(3, ge=1, le=20)
+    rerank: Optional[bool] = None
+    rerank_candidates: Optional[int] = Field(None, ge=1, le=200)
+    rerank_budget_ms: Optional[int] = Field(None, ge=1, le=10000)
+
+class ElasticSearchDocument(ExtractedContentFormat):
+    pdf_id: uuid.UUID
+    user_id: Optional[uuid.UUID] = None
+    embedding: Optional[List[float]] = None
+
+class ElasticSearchResponse(BaseModel):
+    pdf_id: uuid.UUID
+    type: str
+    page_number: int
+    block_index: int
+    block_end_index: Optional[int] = None
+    content: str
+    score: Optional[float] = None
+    highlights: List[str] = []
+    # Best blocks of the same PDF or page when results are grouped
+    inner_hits: List["ElasticSearchResponse"] = []
+
+class BulkIndexResult(BaseModel):
+    indexed: int = 0
+    errors: List[Dict[str, Any]] = []
+
+class SearchBackend(ABC):
+    @abstractmethod
+    def index_document(self, documents: Iterable[ElasticSearchDocument], **options) -> BulkIndexResult:
+        ...
+
+    @abstractmethod
+    def iter_pdf_blocks(self, pdf_id: Optional[uuid.UUID] = None, index_name: Optional[str] = None) -> Iterator[ElasticSearchDocument]:
+        ...
+
+    @abstractmethod
+    def delete_pdf_blocks(self, pdf_ids: Iterable[uuid.UUID], pages: Optional[Iterable[int]] = None) -> int:
+        ...
+
+    @abstractmethod
+    def iter_indexed_pdf_ids(self) -> Iterator[uuid.UUID]:
+        ...
+
+    def iter_unowned_pdf_ids(self) -> Iterator[uuid.UUID]:
+        return iter(())
+
+    def set_pdf_owner(self, pdf_id: uuid.UUID, user_id: uuid.UUID) -> int:
+        return 0
+
+    def merge_segments(self) -> int:
+        return 0
+
+    @abstractmethod
+    async def search(
+        self,
+        user_id: uuid.UUID,
+        pdf_id: Optional[uuid.UUID],
+        query_embedding: List[float],
+        topk: int = 5,
+        query_text: Optional[str] = None,
+        mode: str = "knn",
+        fusion: str = "rrf",
+        k: Optional[int] = None,
+        num_candidates: Optional[int] = None,
+        knn_weight: float = 0.5,
+        highlight: bool = False,
+        group_by: Optional[GroupBy] = None,
+        inner_hits: int = 3
+    ) -> List[ElasticSearchResponse]:
+        ...
+
+    async def ping(self) -> bool:
+        return True
+
+    async def close(self):
+        pass
+
+def hits_to_responses(hits: List[dict]) -> List[ElasticSearchResponse]:
+    return [
+        ElasticSearchResponse(
+            pdf_id=hit["_source"].get("pdf_id"),
+            type=hit["_source"].get("type"),
+            page_number=hit["_source"].get("page_number"),
+            block_index=hit["_source"].get("block_index"),
+            block_end_index=hit["_source"].get("block_end_index"),
+            content=hit["_source"].get("content"),
+            score=hit.get("_score"),
+            highlights=hit.get("highlight", {}).get("content", []),
+            inner_hits=hits_to_responses(hit.get("inner_hits", {}).get("group", {}).get("hits", {}).get("hits", [])),
+        )
+        for hit in hits
+    ]
+
+def group_key(group_by: Optional[str]) -> Callable[[dict], Hashable]:
+    if group_by == "page":
+        return lambda hit: (hit["_source"].get("pdf_id"), hit["_source"].get("page_number"))
+    if group_by == "pdf":
+        return lambda hit: hit["_source"].get("pdf_id")
+    return lambda hit: hit["_id"]
+
+def collapse_hits(hits: List[dict], group_by: str, inner_hits: int, topk: int) -> List[dict]:
+    # Same shape as an Elasticsearch collapse with inner hits: the best hit of every group,
+    # carrying the group's best blocks
+    key = group_key(group_by)
+    groups: Dict[Hashable, dict] = {}
+
+    for hit in hits:
+        group = groups.get(key(hit))
+        if group is None:
+            if len(groups) >= topk:
+                continue
+            group = groups[key(hit)] = {**hit, "inner_hits": {"group": {"hits": {"hits": []}}}}
+
+        group_hits = group["inner_hits"]["group"]["hits"]["hits"]
+        if len(group_hits) < inner_hits:
+            group_hits.append(hit)
+
+    return list(groups.values())
+
+def highlight_fragments(content: str, query_text: str, fragment_size: int = 150, max_fragments: int = 3) -> List[str]:
+    terms = set(re.findall(r"\w+", query_text.lower()))
+    if not terms:
+        return []
+
+    pattern = re.compile(r"\b(" + "|".join(map(re.escape, sorted(terms))) + r")\b", re.IGNORECASE)
+    fragments: List[str] = []
+    covered = 0
+
+    for match in pattern.finditer(content):
+        if match.start() < covered:
+            continue
+
+        start = max(0, match.start() - fragment_size // 3)
+        end = min(len(content), start + fragment_size)
+        fragments.append(pattern.sub(r"<em>\1</em>", content[start:end]))
+        covered = end
+
+        if len(fragments) >= max_fragments:
+            break
+
+    return fragments
+
+def reciprocal_rank_fusion(ranked_lists: List[List[dict]], topk: int, rank_constant: Optional[int] = None, key: Optional[Callable[[dict], Hashable]] = None) -> List[dict]:
+    rank_constant = rank_constant or settings.RRF_RANK_CONSTANT
+    key = key or group_key(None)
+    scores: Dict[Hashable, float] = {}
+    hits_by_key: Dict[Hashable, dict] = {}
+
+    for hits in ranked_lists:
+        for rank, hit in enumerate(hits, start=1):
+            scores[key(hit)] = scores.get(key(hit), 0.0) + 1.0 / (rank_constant + rank)
+            hits_by_key.setdefault(key(hit), hit)
+
+    ranked_keys = sorted(scores, key=scores.get, reverse=True)[:topk]
+    return [{**hits_by_key[hit_key], "_score": scores[hit_key]} for hit_key in ranked_keys]
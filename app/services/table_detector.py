@@ -0,0 +1,100 @@
+from app.config.config import settings
+from app.utils.metrics import table_detection_total
+from collections import Counter, defaultdict
+from itertools import combinations
+from typing import List, Sequence, Tuple
+import pymupdf
+
+Bbox = Tuple[float, float, float, float]
+
+def count_ruling_lines(page: pymupdf.Page) -> Tuple[int, int]:
+    # Horizontal and vertical segments drawn on the page, rectangles count as their four edges
+    horizontal = vertical = 0
+    tolerance = settings.TABLE_LINE_TOLERANCE
+
+    for drawing in page.get_cdrawings():
+        for item in drawing["items"]:
+            if item[0] == "l":
+                (x0, y0), (x1, y1) = item[1][:2], item[2][:2]
+                if abs(y0 - y1) <= tolerance and abs(x0 - x1) > tolerance:
+                    horizontal += 1
+                elif abs(x0 - x1) <= tolerance and abs(y0 - y1) > tolerance:
+                    vertical += 1
+            elif item[0] == "re":
+                x0, y0, x1, y1 = item[1][:4]
+                if abs(x1 - x0) > tolerance and abs(y1 - y0) > tolerance:
+                    horizontal += 2
+                    vertical += 2
+                elif abs(y1 - y0) <= tolerance:
+                    horizontal += 1
+                else:
+                    vertical += 1
+
+    return horizontal, vertical
+
+def has_ruling_lines(page: pymupdf.Page) -> bool:
+    horizontal, vertical = count_ruling_lines(page)
+    return horizontal >= 2 and vertical >= 2 and horizontal + vertical >= settings.TABLE_MIN_LINES
+
+def column_starts(page: pymupdf.Page) -> List[List[int]]:
+    # Per row of text, the x positions (in TABLE_LINE_TOLERANCE buckets) of words that follow a
+    # gap wider than the text is tall. Word spacing in prose never gets that wide, and the row's
+    # first word (the left margin, present on every row) is not a column start
+    tolerance = settings.TABLE_LINE_TOLERANCE
+    rows = defaultdict(list)
+    for word in page.get_text("words"):
+        # Cells of one table row are often separate blocks, so rows are grouped by baseline
+        rows[round(word[3] / tolerance)].append(word)
+
+    starts = []
+    for words in rows.values():
+        words.sort(key=lambda word: word[0])
+        starts.append(sorted({
+            round(word[0] / tolerance)
+            for previous, word in zip(words, words[1:])
+            if word[0] - previous[2] >= word[3] - word[1]
+        }))
+    return starts
+
+def has_aligned_columns(page: pymupdf.Page) -> bool:
+    # Borderless tables show up as at least two columns starting at the same x positions
+    # on the same TABLE_MIN_ROWS rows
+    starts = column_starts(page)
+    bucket_rows = Counter(bucket for row in starts for bucket in row)
+    frequent = {bucket for bucket, rows in bucket_rows.items() if rows >= settings.TABLE_MIN_ROWS}
+
+    pair_rows = Counter(
+        pair
+        for row in starts
+        for pair in combinations([bucket for bucket in row if bucket in frequent], 2)
+    )
+    return any(rows >= settings.TABLE_MIN_ROWS for rows in pair_rows.values())
+
+def may_contain_tables(page: pymupdf.Page) -> bool:
+    if settings.TABLE_STRATEGY == "text":
+        return has_aligned_columns(page)
+    return has_ruling_lines(page)
+
+def find_tables(page: pymupdf.Page) -> List["pymupdf.table.Table"]:
+    if settings.TABLE_STRATEGY == "off":
+        return []
+
+    # find_tables is one of the most expensive calls per page, skip it where no table can be
+    if settings.TABLE_PRECHECK and not may_contain_tables(page):
+        table_detection_total.labels(result="skipped").inc()
+        return []
+
+    table_detection_total.labels(result="searched").inc()
+    return list(page.find_tables(strategy=settings.TABLE_STRATEGY))
+
+def overlap_ratio(bbox: Bbox, container: Bbox) -> float:
+    width = min(bbox[2], container[2]) - max(bbox[0], container[0])
+    height = min(bbox[3], container[3]) - max(bbox[1], container[1])
+    area = (bbox[2] - bbox[0]) * (bbox[3] - bbox[1])
+
+    if width <= 0 or height <= 0 or area <= 0:
+        return 0.0
+    return width * height / area
+
+def inside_tables(bbox: Bbox, table_bboxes: Sequence[Bbox]) -> bool:
+    return any(overlap_ratio(bbox, table_bbox) >= settings.TABLE_OVERLAP_RATIO for table_bbox in table_bboxes)
@@ -4,6 +4,7 @@ from sqlalchemy.orm import Session
 from fastapi import Depends
 from app.utils.hashing import get_password_hash
 from app.models import User
+from app.services.identity_cache import invalidate_user
 
 def create_user(user: UserCreate, db: Session = Depends(get_db)):
     hashed_password = get_password_hash(user.password)
@@ -17,6 +18,7 @@ def create_user(user: UserCreate, db: Session = Depends(get_db)):
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
+    invalidate_user(db_user.email)
 
     return db_user
 
@@ -0,0 +1,24 @@
+from app.config.config import settings
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import asyncio
+
+# Model inference gets its own bounded pool so it can't starve the default threadpool
+# that FastAPI uses for sync routes and dependencies
+embedding_executor = ThreadPoolExecutor(max_workers=settings.EMBEDDING_THREADS, thread_name_prefix="embedding")
+# Re-ranking has a pool of its own, a request that ran over its latency budget keeps a
+# thread busy until it finishes and must not hold up query embeddings
+rerank_executor = ThreadPoolExecutor(max_workers=settings.RERANK_THREADS, thread_name_prefix="rerank")
+search_semaphore = asyncio.Semaphore(settings.SEARCH_CONCURRENCY)
+
+async def run_in_embedding_executor(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(embedding_executor, partial(func, *args, **kwargs))
+
+async def run_in_rerank_executor(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(rerank_executor, partial(func, *args, **kwargs))
+
+def shutdown_executors():
+    embedding_executor.shutdown(wait=True, cancel_futures=True)
+    rerank_executor.shutdown(wait=True, cancel_futures=True)
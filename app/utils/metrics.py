@@ -0,0 +1,64 @@
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+from contextlib import contextmanager
+from typing import Tuple
+import os
+import time
+
+# Set PROMETHEUS_MULTIPROC_DIR to also collect metrics recorded in the extraction pool processes
+# (OCR runs there for large PDFs) and across multiple uvicorn workers
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+stage_duration_seconds = Histogram(
+    "pdf_search_stage_duration_seconds",
+    "Duration of ingestion and search stages",
+    ["stage"],
+    buckets=DURATION_BUCKETS,
+)
+blocks_total = Counter(
+    "pdf_search_blocks_total",
+    "Extracted blocks sent to embedding, by block type",
+    ["type"],
+)
+ocr_images_skipped_total = Counter(
+    "pdf_search_ocr_images_skipped_total",
+    "Images skipped by OCR because they were repeated or too small",
+)
+cache_requests_total = Counter(
+    "pdf_search_cache_requests_total",
+    "Cache lookups by cache and result",
+    ["cache", "result"],
+)
+table_detection_total = Counter(
+    "pdf_search_table_detection_total",
+    "Pages searched for tables or skipped by the pre-check",
+    ["result"],
+)
+rerank_total = Counter(
+    "pdf_search_rerank_total",
+    "Re-ranked searches by outcome: applied, timeout (first-stage order returned) or error",
+    ["result"],
+)
+index_failures_total = Counter(
+    "pdf_search_index_failures_total",
+    "Blocks rejected by the search backend during bulk indexing",
+)
+
+@contextmanager
+def observe_stage(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_duration_seconds.labels(stage=stage).observe(time.perf_counter() - start)
+
+def render_metrics() -> Tuple[bytes, str]:
+    if MULTIPROCESS:
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,86 @@
+from fastapi import HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from app.config.config import settings
+from typing import BinaryIO, Tuple
+import hashlib
+import os
+import uuid
+
+PDF_MAGIC = b"%PDF-"
+
+def upload_path(job_id: uuid.UUID) -> str:
+    os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+    return os.path.join(settings.UPLOAD_DIR, f"{job_id}.pdf")
+
+def remove_file(file_path: str):
+    if os.path.exists(file_path):
+        os.remove(file_path)
+
+async def save_upload(job_id: uuid.UUID, file: UploadFile) -> Tuple[str, str]:
+    # Streams the upload to disk in fixed-size chunks, hashing as it goes, so memory per upload stays constant
+    if file.size is not None and file.size > settings.UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"File too large. Maximum size is {settings.UPLOAD_MAX_BYTES} bytes.")
+
+    first_chunk = await file.read(settings.UPLOAD_CHUNK_SIZE)
+    if not first_chunk.startswith(PDF_MAGIC):
+        raise HTTPException(status_code=415, detail="Invalid file type. Only PDF files are allowed.")
+
+    file_path = upload_path(job_id)
+    part_path = file_path + ".part"
+
+    content_hash = hashlib.sha256()
+    size = 0
+    f = await run_in_threadpool(open, part_path, "wb")
+
+    try:
+        chunk = first_chunk
+        while chunk:
+            size += len(chunk)
+            if size > settings.UPLOAD_MAX_BYTES:
+                raise HTTPException(status_code=413, detail=f"File too large. Maximum size is {settings.UPLOAD_MAX_BYTES} bytes.")
+
+            content_hash.update(chunk)
+            await run_in_threadpool(f.write, chunk)
+            chunk = await file.read(settings.UPLOAD_CHUNK_SIZE)
+
+        await run_in_threadpool(f.close)
+        os.replace(part_path, file_path)
+
+    except BaseException:
+        await run_in_threadpool(f.close)
+        await run_in_threadpool(remove_file, part_path)
+        raise
+
+    return file_path, content_hash.hexdigest()
+
+def spool_file(job_id: uuid.UUID, source: BinaryIO) -> Tuple[str, str]:
+    # Same as save_upload for files read from disk or from an archive, errors are raised as ValueError
+    first_chunk = source.read(settings.UPLOAD_CHUNK_SIZE)
+    if not first_chunk.startswith(PDF_MAGIC):
+        raise ValueError("Not a PDF file.")
+
+    file_path = upload_path(job_id)
+    part_path = file_path + ".part"
+
+    content_hash = hashlib.sha256()
+    size = 0
+
+    try:
+        with open(part_path, "wb") as f:
+            chunk = first_chunk
+            while chunk:
+                size += len(chunk)
+                if size > settings.UPLOAD_MAX_BYTES:
+                    raise ValueError(f"File too large. Maximum size is {settings.UPLOAD_MAX_BYTES} bytes.")
+
+                content_hash.update(chunk)
+                f.write(chunk)
+                chunk = source.read(settings.UPLOAD_CHUNK_SIZE)
+
+        os.replace(part_path, file_path)
+
+    except BaseException:
+        remove_file(part_path)
+        raise
+
+    return file_path, content_hash.hexdigest()
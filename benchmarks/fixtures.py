@@ -0,0 +1,74 @@
+import pymupdf
+import random
+
+WORDS = (
+    "market stock share price index trade volume equity bond yield dividend capital "
+    "investor broker exchange portfolio risk return growth value sector earnings revenue"
+).split()
+
+def sentence(rng: random.Random, words: int = 12) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+def paragraph(rng: random.Random, sentences: int = 6) -> str:
+    return " ".join(sentence(rng) for _ in range(sentences))
+
+def add_text_pages(pdf: pymupdf.Document, pages: int, rng: random.Random):
+    for _ in range(pages):
+        page = pdf.new_page()
+        y = 50
+        while y < page.rect.height - 150:
+            page.insert_textbox(pymupdf.Rect(50, y, page.rect.width - 50, y + 120), paragraph(rng), fontsize=10)
+            y += 130
+
+def make_text_pdf(path: str, pages: int, seed: int = 0):
+    pdf = pymupdf.open()
+    add_text_pages(pdf, pages, random.Random(seed))
+    pdf.save(path)
+    pdf.close()
+
+def make_table_pdf(path: str, pages: int, rows: int = 20, cols: int = 5, seed: int = 0):
+    # Ruled grids with a value in every cell, what the line-based table finder looks for
+    rng = random.Random(seed)
+    pdf = pymupdf.open()
+
+    for _ in range(pages):
+        page = pdf.new_page()
+        page.insert_text((50, 40), sentence(rng, 6), fontsize=12)
+
+        cell_width = (page.rect.width - 100) / cols
+        cell_height = 18
+        for row in range(rows):
+            for col in range(cols):
+                cell = pymupdf.Rect(
+                    50 + col * cell_width, 60 + row * cell_height,
+                    50 + (col + 1) * cell_width, 60 + (row + 1) * cell_height
+                )
+                page.draw_rect(cell, color=(0, 0, 0), width=0.5)
+                text = rng.choice(WORDS) if row == 0 else f"{rng.uniform(0, 1000):.2f}"
+                page.insert_text((cell.x0 + 3, cell.y1 - 5), text, fontsize=8)
+
+        page.insert_textbox(pymupdf.Rect(50, 80 + rows * cell_height, page.rect.width - 50, page.rect.height - 50), paragraph(rng), fontsize=10)
+
+    pdf.save(path)
+    pdf.close()
+
+def make_scanned_pdf(path: str, pages: int, dpi: int = 150, seed: int = 0):
+    # Every page is a single rendered image with no text layer, like the output of a scanner
+    text_pdf = pymupdf.open()
+    add_text_pages(text_pdf, pages, random.Random(seed))
+    pdf = pymupdf.open()
+
+    for text_page in text_pdf:
+        pixmap = text_page.get_pixmap(dpi=dpi, colorspace=pymupdf.csGRAY)
+        page = pdf.new_page(width=text_page.rect.width, height=text_page.rect.height)
+        page.insert_image(page.rect, stream=pixmap.tobytes("png"))
+
+    pdf.save(path)
+    pdf.close()
+    text_pdf.close()
+
+PDF_FACTORIES = {
+    "text": make_text_pdf,
+    "table": make_table_pdf,
+    "scanned": make_scanned_pdf,
+}
@@ -0,0 +1,278 @@
+from benchmarks.fixtures import PDF_FACTORIES, sentence
+from typing import Callable, Dict, List, Optional
+from elastic_transport import ApiResponseMeta, BaseNode, HttpHeaders, NodeApiResponse
+import argparse
+import datetime
+import json
+import numpy as np
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+def timed(fn: Callable, repeat: int) -> List[float]:
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    values = np.asarray(samples) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p90_ms": round(float(np.percentile(values, 90)), 3),
+        "p99_ms": round(float(np.percentile(values, 99)), 3),
+        "mean_ms": round(float(values.mean()), 3),
+    }
+
+def result(name: str, params: dict, metrics: dict) -> dict:
+    print(f"{name} {params}: {metrics}", file=sys.stderr)
+    return {"name": name, "params": params, "metrics": metrics}
+
+def random_documents(count: int, user_id: uuid.UUID, pdf_id: uuid.UUID, dims: int, seed: int = 0):
+    from app.services.search_backend import ElasticSearchDocument
+
+    rng = random.Random(seed)
+    vectors = np.random.default_rng(seed).standard_normal((count, dims)).astype(np.float32)
+    for i in range(count):
+        yield ElasticSearchDocument(
+            pdf_id=pdf_id,
+            user_id=user_id,
+            type="text",
+            page_number=i // 20,
+            block_index=i % 20,
+            content=sentence(rng, 30),
+            embedding=vectors[i].tolist()
+        )
+
+def bench_extraction(work_dir: str, pages: int, repeat: int) -> List[dict]:
+    from app.services.pdf_extractor import extract_pdf_content, shutdown_extraction_executor
+    from app.services.ocr import shutdown_ocr_executor
+
+    results = []
+    try:
+        for kind, factory in PDF_FACTORIES.items():
+            path = os.path.join(work_dir, f"{kind}.pdf")
+            factory(path, pages)
+
+            blocks = len(extract_pdf_content(path).all_content)
+            durations = timed(lambda: extract_pdf_content(path), repeat)
+            results.append(result("extraction", {"pdf": kind, "pages": pages}, {
+                "blocks": blocks,
+                "seconds": round(statistics.median(durations), 4),
+                "pages_per_sec": round(pages / statistics.median(durations), 2),
+            }))
+    finally:
+        shutdown_extraction_executor()
+        shutdown_ocr_executor()
+
+    return results
+
+def bench_embedding(texts: int, batch_sizes: List[int], repeat: int) -> List[dict]:
+    from app.services.embedding import embedding_service
+
+    rng = random.Random(0)
+    corpus = [sentence(rng, rng.randint(5, 80)) for _ in range(texts)]
+    embedding_service.warm_up()
+
+    results = []
+    for batch_size in batch_sizes:
+        # encode_batches skips the embedding cache, so every run does the full work
+        durations = timed(lambda: embedding_service.encode_batches(corpus, batch_size), repeat)
+        results.append(result("embedding", {"texts": texts, "batch_size": batch_size, "backend": embedding_service.backend}, {
+            "seconds": round(statistics.median(durations), 4),
+            "texts_per_sec": round(texts / statistics.median(durations), 2),
+        }))
+
+    return results
+
+class BulkStandInNode(BaseNode):
+    # Answers Elasticsearch requests locally, so bulk indexing can be measured without a cluster:
+    # the time spent is the client's serialization and batching, not the server's
+    def perform_request(self, method, target, body=None, headers=None, request_timeout=None):
+        path = target.split("?")[0]
+
+        if path.endswith("/_bulk"):
+            actions = (body or b"").count(b"\n") // 2
+            data = {"took": 0, "errors": False, "items": [{"index": {"status": 201}}] * actions}
+        elif path.endswith("/_settings") and method == "GET":
+            data = {"stand-in": {"settings": {"index": {"refresh_interval": "1s"}}}}
+        elif path.endswith("/_mapping") and method == "GET":
+            data = {"stand-in": {"mappings": {"properties": {}}}}
+        else:
+            data = {"acknowledged": True}
+
+        meta = ApiResponseMeta(
+            status=200,
+            http_version="1.1",
+            headers=HttpHeaders({"content-type": "application/json", "x-elastic-product": "Elasticsearch"}),
+            duration=0.0,
+            node=self.config,
+        )
+        return NodeApiResponse(meta, json.dumps(data).encode() if method != "HEAD" else b"")
+
+def bench_indexing(work_dir: str, documents: int, repeat: int) -> List[dict]:
+    from app.config.config import settings
+    from app.services.elastic_search import ElasticSearchService
+    from app.services.local_search import LocalVectorSearch
+    from elasticsearch import Elasticsearch
+
+    user_id, pdf_id = uuid.uuid4(), uuid.uuid4()
+    docs = list(random_documents(documents, user_id, pdf_id, settings.EMBEDDING_DIMS))
+
+    es_service = ElasticSearchService()
+    es_service.es = Elasticsearch(hosts=["http://stand-in:9200"], node_class=BulkStandInNode)
+
+    backends = {
+        "elasticsearch-stand-in": lambda: es_service,
+        "local": lambda: LocalVectorSearch(tempfile.mkdtemp(dir=work_dir)),
+    }
+
+    results = []
+    for name, create_backend in backends.items():
+        durations = timed(lambda: create_backend().index_document(docs), repeat)
+        results.append(result("indexing", {"backend": name, "documents": documents, "encoding": settings.ES_VECTOR_ENCODING}, {
+            "seconds": round(statistics.median(durations), 4),
+            "docs_per_sec": round(documents / statistics.median(durations), 2),
+        }))
+
+    return results
+
+def bench_search(documents: int, requests: int, concurrency: int, mode: str) -> List[dict]:
+    from app.config.config import settings
+    from app.db.database import get_async_db
+    from app.services.search import search_service
+    from app.utils.auth import get_current_user
+    from types import SimpleNamespace
+    from main import app
+    import asyncio
+    import httpx
+
+    user_id = uuid.uuid4()
+    search_service.index_document(random_documents(documents, user_id, uuid.uuid4(), settings.EMBEDDING_DIMS))
+
+    async def no_db():
+        yield None
+
+    app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(id=user_id)
+    app.dependency_overrides[get_async_db] = no_db
+
+    rng = random.Random(1)
+    queries = [sentence(rng, 6) for _ in range(requests)]
+
+    async def run_load() -> tuple:
+        # Requests go through the ASGI app in-process on one event loop, like the FastAPI test client,
+        # with at most `concurrency` of them in flight
+        limit = asyncio.Semaphore(concurrency)
+        transport = httpx.ASGITransport(app=app)
+
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            async def send(query: str) -> float:
+                async with limit:
+                    start = time.perf_counter()
+                    response = await client.post("/search", json={"query": query, "topk": 5, "mode": mode})
+                    response.raise_for_status()
+                    return time.perf_counter() - start
+
+            await send(queries[0])
+            start = time.perf_counter()
+            latencies = await asyncio.gather(*(send(query) for query in queries))
+            return latencies, time.perf_counter() - start
+
+    try:
+        latencies, elapsed = asyncio.run(run_load())
+    finally:
+        app.dependency_overrides.clear()
+
+    return [result("search", {"backend": settings.SEARCH_BACKEND, "documents": documents, "concurrency": concurrency, "mode": mode}, {
+        **percentiles(latencies),
+        "requests_per_sec": round(requests / elapsed, 2),
+    })]
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+def compare(baseline_path: str, report: dict):
+    # Ratio of every metric against the baseline run, > 1 means the metric grew
+    with open(baseline_path) as f:
+        baseline = {(r["name"], json.dumps(r["params"], sort_keys=True)): r["metrics"] for r in json.load(f)["results"]}
+
+    for r in report["results"]:
+        previous = baseline.get((r["name"], json.dumps(r["params"], sort_keys=True)))
+        if not previous:
+            continue
+        for metric, value in r["metrics"].items():
+            if previous.get(metric):
+                print(f"{r['name']} {r['params']} {metric}: {previous[metric]} -> {value} ({value / previous[metric]:.2f}x)", file=sys.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run")
+    parser.add_argument("suites", nargs="*", default=["extraction", "embedding", "indexing", "search"], choices=["extraction", "embedding", "indexing", "search"])
+    parser.add_argument("--pages", type=int, default=20, help="Pages per synthetic PDF")
+    parser.add_argument("--texts", type=int, default=512, help="Texts to embed")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[16, 32, 64, 128])
+    parser.add_argument("--documents", type=int, default=5000, help="Blocks to index")
+    parser.add_argument("--requests", type=int, default=200, help="Search requests to send")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--mode", default="knn", choices=["knn", "hybrid"])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    parser.add_argument("--compare", help="Baseline JSON report to compare against")
+    args = parser.parse_args()
+
+    # The benchmarks run without Postgres or Elasticsearch unless told otherwise, these have to
+    # be set before the app settings are loaded. Spawned extraction workers inherit them.
+    work_dir = tempfile.mkdtemp(prefix="pdf-search-bench-")
+    os.environ.setdefault("SEARCH_BACKEND", "local")
+    os.environ.setdefault("LOCAL_SEARCH_DIR", os.path.join(work_dir, "search"))
+    os.environ.setdefault("EMBEDDING_CACHE_PATH", "")
+    os.environ.setdefault("ES_HOST", "http://localhost:9200")
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+    report = {
+        "meta": {
+            "timestamp": datetime.datetime.now().isoformat(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": vars(args),
+        },
+        "results": [],
+    }
+
+    try:
+        if "extraction" in args.suites:
+            report["results"] += bench_extraction(work_dir, args.pages, args.repeat)
+        if "embedding" in args.suites:
+            report["results"] += bench_embedding(args.texts, args.batch_sizes, args.repeat)
+        if "indexing" in args.suites:
+            report["results"] += bench_indexing(work_dir, args.documents, args.repeat)
+        if "search" in args.suites:
+            report["results"] += bench_search(args.documents, args.requests, args.concurrency, args.mode)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if args.compare:
+        compare(args.compare, report)
+
+if __name__ == "__main__":
+    main()
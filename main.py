@@ -1,15 +1,68 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
 from app.routes.user import router as user_router
 from app.routes.pdf import router as pdf_router
-from app.db.database import init_db
+from app.db.database import close_db, init_db, ping_db, pool_status
+from app.services.job_queue import job_queue
+from app.services.compaction import compaction_scheduler
+from app.services.pdf_extractor import shutdown_extraction_executor
+from app.services.ocr import shutdown_ocr_executor
+from app.services.embedding import embedding_service
+from app.services.reranker import reranker_service
+from app.services.ingestion import document_dedup_stats
+from app.services.search import search_service
+from app.utils.concurrency import shutdown_executors
+from app.utils.metrics import render_metrics
+from app.config.config import settings
+import asyncio
+import json
 import os
+import time
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
 
 app = FastAPI(title="Pdf Search App")
+shutting_down = False
+
+@app.middleware("http")
+async def log_request_timing(request: Request, call_next):
+    if not settings.REQUEST_TIMING_LOG:
+        return await call_next(request)
+
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        print(json.dumps({
+            "event": "request",
+            "method": request.method,
+            "path": request.url.path,
+            "status": status_code,
+            "duration_ms": round((time.perf_counter() - start) * 1000, 2),
+        }))
 
 @app.on_event("startup")
 async def startup_event():
     init_db()
+    embedding_service.warm_up()
+    if settings.RERANK_ENABLED:
+        reranker_service.warm_up()
+    job_queue.start()
+    compaction_scheduler.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    global shutting_down
+    # Readiness fails first so the load balancer stops routing here while workers drain
+    shutting_down = True
+    job_queue.stop(timeout=settings.SHUTDOWN_TIMEOUT)
+    compaction_scheduler.stop(timeout=settings.SHUTDOWN_TIMEOUT)
+    shutdown_extraction_executor()
+    shutdown_ocr_executor()
+    shutdown_executors()
+    await search_service.close()
+    await close_db()
 
 app.include_router(user_router)
 app.include_router(pdf_router)
@@ -17,3 +70,43 @@ app.include_router(pdf_router)
 @app.get("/")
 def read_root():
     return {"message": "Welcome to the Pdf Search App"}
+
+async def check_backend(ping) -> bool:
+    try:
+        return bool(await asyncio.wait_for(ping(), timeout=settings.HEALTH_CHECK_TIMEOUT))
+    except Exception as e:
+        print(f"Readiness check failed: {e!r}")
+        return False
+
+@app.get("/health")
+def read_health():
+    # Liveness only, a backend outage must not get the process restarted
+    return {"status": "ok"}
+
+@app.get("/ready")
+async def read_ready(response: Response):
+    database, search = await asyncio.gather(check_backend(ping_db), check_backend(search_service.ping))
+    ready = database and search and not shutting_down
+    if not ready:
+        response.status_code = 503
+
+    return {
+        "status": "ready" if ready else "unavailable",
+        "database": database,
+        "search": search,
+        "shutting_down": shutting_down,
+        "pools": pool_status(),
+    }
+
+@app.get("/cache-stats")
+def read_cache_stats():
+    return {
+        "embedding": embedding_service.cache.stats(),
+        "query": {**embedding_service.query_cache.stats.as_dict(), "size": len(embedding_service.query_cache)},
+        "document": document_dedup_stats.as_dict(),
+    }
+
+@app.get("/metrics")
+def read_metrics():
+    content, content_type = render_metrics()
+    return Response(content=content, media_type=content_type)
\ No newline at end of file
@@ -0,0 +1,33 @@
+import pytest
+
+pymupdf = pytest.importorskip("pymupdf")
+pytest.importorskip("dotenv")
+pytest.importorskip("prometheus_client")
+
+from app.services.table_detector import has_aligned_columns
+
+PARAGRAPH = (
+    "The stock market is where shares of publicly held companies are issued and traded. "
+    "Prices move with the expectations of investors about future earnings, interest rates "
+    "and the wider economy, and an index tracks the value of a basket of those shares. "
+) * 8
+
+def test_paragraph_page_has_no_aligned_columns():
+    pdf = pymupdf.open()
+    page = pdf.new_page()
+    page.insert_textbox(pymupdf.Rect(50, 50, page.rect.width - 50, page.rect.height - 50), PARAGRAPH, fontsize=10, align=pymupdf.TEXT_ALIGN_JUSTIFY)
+
+    assert not has_aligned_columns(page)
+
+def test_borderless_table_has_aligned_columns():
+    pdf = pymupdf.open()
+    page = pdf.new_page()
+    page.insert_text((50, 60), "Quarterly results by sector", fontsize=12)
+
+    for row in range(6):
+        y = 90 + row * 16
+        page.insert_text((50, y), f"Sector {row}", fontsize=10)
+        for col, x in enumerate((200, 300, 400)):
+            page.insert_text((x, y), f"{(row + 1) * (col + 3) * 1.25:.2f}", fontsize=10)
+
+    assert has_aligned_columns(page)